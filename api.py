@@ -1,122 +1,254 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
-import boto3
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Union
+from pydantic import BaseModel, Field
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, BotoCoreError
-import db_utils as db
+import jobs
+from events import meta_data_ready, DELETED
+from uploads import stream_form_to_storage, read_form, read_body, store_blob, UploadError, BodyTooLarge
+from values import InvalidValues
+import values as helm_values
+from dispatcher import Busy
+from idempotency import InvalidKey, KeyReused, InProgress
+from direct_uploads import FINALIZED, SessionNotFound, SessionBusy, uploaded_files
+from pymongo.errors import DuplicateKeyError
+from pagination import encode_cursor, after_filter, InvalidCursor
+from services import Services, timestamps
+from storage import PresignUnsupported
+from compression import CompressionMiddleware
+from diagnostics import create_loop_monitor
+from settings import Settings
+import metrics
+import tracing
 from bson import ObjectId
-from datetime import datetime, timedelta
-import time
-from os import getenv
-import requests
-from requests.auth import HTTPBasicAuth
-import pytz
 import asyncio
+import logging
+import orjson
 
-client = db.connect_to_db()
-collection = db.get_collection(client, getenv("DB_NAME"), getenv("COL_NAME"))
-s3 = boto3.client('s3')
-bucket_name = "cc-helm-templates"
-tz = pytz.timezone('Asia/Seoul') # 모든 리눅스의 기본 time은 미국 혹은 영국 시간
-
-# 젠킨스 서버 데이터 => Configmap, Secret 예정
-jenkins_url = "http://10.0.1.85:8080/job/CloudCrew-JOB/buildWithParameters"
-jenkins_token = "1151c1c51cd9cdb1d5d8fc1213e1325c3e"
-jenkins_user = "admin"
-header = {'Content-Type': 'application/x-www-form-urlencoded'}
-
-app = FastAPI()
-
-# CORS 미들웨어 설정
-app.add_middleware(
-    CORSMiddleware,
-    # 허용하는 접속 도메인 작성
-    allow_origins=[
-        "http://cloudcrew.site",
-        "https://cloudcrew.site",
-        "http://www.cloudcrew.site",
-        "https://www.cloudcrew.site",
-    ],
-    allow_credentials=True,
-    allow_methods=["*"],  # 모든 HTTP 메소드 허용
-    allow_headers=["*"],  # 모든 HTTP 헤더 허용
-)
+logger = logging.getLogger(__name__)
+
+# 목록 조회에서 fields 로 선택할 수 있는 항목
+list_fields = {"project_name", "end_point", "day", "template_url", "values_url", "meta_data"}
+
+# 응답 모델 (pydantic-core 로 검증 / 직렬화하고 OpenAPI 스키마에도 사용)
+class ProjectView(BaseModel):
+    project_name: str
+    end_point: str = "NULL"
+    day: str
+    meta_data: Dict[str, Any] = Field(default_factory=dict)
+
+# fields 로 고른 항목만 담김 (response_model_exclude_unset 로 고르지 않은 항목은 생략)
+class ProjectSummary(BaseModel):
+    project_id: str
+    project_name: Optional[str] = None
+    end_point: Optional[str] = None
+    day: Optional[str] = None
+    template_url: Optional[str] = None
+    values_url: Optional[str] = None
+    meta_data: Optional[Dict[str, Any]] = None
+
+class JobView(BaseModel):
+    job_id: str
+    type: str
+    project_id: str
+    status: str
+    error: Optional[str] = None
+    build_number: Optional[int] = None
+    build_result: Optional[str] = None
+    build_duration: Optional[float] = None
+    created_at: str
+    updated_at: str
+
+class RevisionView(BaseModel):
+    revision: int
+    job_id: str
+    type: str
+    status: str
+    helm_status: Optional[str] = None
+    chart: Optional[str] = None
+    app_version: Optional[str] = None
+    last_deployed: Optional[str] = None
+    values_key: Optional[str] = None
+    values_digest: Optional[str] = None
+    build_number: Optional[int] = None
+    build_result: Optional[str] = None
+    build_duration: Optional[float] = None
+    recorded_at: str
+
+router = APIRouter()
+
+# 앱마다 하나씩 만든 클라이언트 / 백그라운드 작업 모음
+def get_services(request: Request) -> Services:
+    return request.app.state.services
+
+def accepted(job_id, project_id):
+    return ORJSONResponse(
+        content={"job_id": job_id, "project_id": project_id},
+        status_code=202,
+        headers={"Location": f"/api/v1/jobs/{job_id}"}
+    )
+
+# 해석한 values 가 배포된 값과 같으면 저장 / 빌드 없이 200
+def unchanged(project_id):
+    return ORJSONResponse(content={"status": "unchanged", "job_id": None, "project_id": project_id})
+
+def too_busy(e):
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+# 같은 Idempotency-Key 로 재시도한 요청에 첫 응답을 그대로 돌려줌
+def replayed(response):
+    return ORJSONResponse(
+        content=response["body"],
+        status_code=response["status_code"],
+        headers={"Location": f"/api/v1/jobs/{response['body']['job_id']}", "Idempotent-Replayed": "true"}
+    )
 
 # api 주소 시작 페이지 API 구성 (디버깅용)
-@app.get("/api")
+@router.get("/api")
 async def root():
     return {"message": "Welcome to the API"}
 
-# [GET] 프로젝트 목록 전체 조회
-@app.get("/api/v1/projects", response_model=List[str])
-async def get_projects():
+# [GET] liveness: 이벤트 루프가 응답하면 정상
+@router.get("/health/live", include_in_schema=False)
+async def liveness():
+    return {"status": "alive"}
+
+# [GET] readiness: 준비 작업이 끝났고 종료 중이 아니며 몽고 / 저장소에 연결되면 정상
+# 젠킨스 상태는 참고용 (젠킨스가 멈춰도 작업은 대기열에 쌓임)
+@router.get("/health/ready", include_in_schema=False)
+async def readiness(svc: Services = Depends(get_services)):
+    checks = await svc.health()
+    ready = svc.ready and not svc.draining and checks["mongo"] == "ok" and checks["storage"] == "ok"
+    content = {
+        "status": "ready" if ready else "unavailable", "draining": svc.draining,
+        "leader": svc.lease.is_leader, "checks": checks
+    }
+    return ORJSONResponse(content=content, status_code=200 if ready else 503)
+
+# [GET] Prometheus 수집용 지표
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    content, media_type = metrics.render()
+    return Response(content=content, media_type=media_type)
+
+# [GET] 이벤트 루프 지연 / 최근 멈춤 기록 (멈춘 순간의 스택 포함)
+@router.get("/debug/loop", include_in_schema=False)
+async def get_loop(request: Request):
+    monitor = request.app.state.loop_monitor
+    if monitor is None:
+        raise HTTPException(status_code=404, detail="Loop monitor is disabled")
+    return monitor.snapshot()
+
+# [GET] 프로젝트 목록 조회 (최근 수정 순, 커서 페이지네이션)
+# 다음 페이지 커서는 X-Next-Cursor 헤더로 전달, fields 를 주면 ID 대신 선택한 항목을 반환
+@router.get(
+    "/api/v1/projects", response_model=Union[List[str], List[ProjectSummary]], response_model_exclude_unset=True
+)
+async def get_projects(
+    response: Response,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    fields: Optional[str] = None,
+    svc: Services = Depends(get_services)
+):
+    # 페이지 크기 => PROJECT_PAGE_SIZE / PROJECT_MAX_PAGE_SIZE
+    limit = svc.settings.project_page_size if limit is None else limit
+    if not 1 <= limit <= svc.settings.project_max_page_size:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {svc.settings.project_max_page_size}")
     try:
-        projects = collection.find().sort("day", -1)
-        return [str(project['_id']) for project in projects]
+        selected = [field for field in (fields or "").split(",") if field]
+        unknown = set(selected) - list_fields
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        query = after_filter(after, "day_at") if after else {}
+        projection = {field: 1 for field in selected + ["day_at"]}
+        projects = await svc.collection.find(
+            query, projection, sort=[("day_at", -1), ("_id", -1)], limit=limit
+        )
+
+        if len(projects) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(projects[-1], "day_at")
+
+        if not selected:
+            return [str(project['_id']) for project in projects]
+        return [
+            {"project_id": str(project["_id"]), **{field: project.get(field) for field in selected}}
+            for project in projects
+        ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 스트리밍 업로드 엔드포인트의 OpenAPI 요청 본문 스키마
+def form_schema(files, fields=()):
+    properties = {name: {"type": "string"} for name in fields}
+    properties.update({name: {"type": "string", "format": "binary"} for name in files})
+    schema = {"type": "object", "required": [*fields, *files], "properties": properties}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": schema}}}}
+
 # [POST] SB 프로젝트 생성
-@app.post("/api/v1/projects")
-async def new_project(
-    project_name: str = Form(...),
-    template: UploadFile = File(...),
-    values: UploadFile = File(...)
-):
+# 요청 본문을 임시 파일로 받지 않고 template / values 를 바로 S3 로 스트리밍
+# Idempotency-Key 헤더가 있으면 업로드 전에 키를 선점하고, 같은 키의 재시도에는 처음 만든 작업 / 프로젝트를 돌려줌
+@router.post("/api/v1/projects", openapi_extra=form_schema(("template", "values"), ("project_name",)))
+@tracing.traced("new_project")
+async def new_project(request: Request, svc: Services = Depends(get_services)):
     try:
-        current_time = datetime.now(tz).strftime("%Y:%m:%d:%H:%M:%S")
-        
-        data = {
-            "project_name": project_name,
-            "template_url": "NULL",
-            "values_url": "NULL",
-            "end_point": "NULL",
-            "day": current_time,
-            "meta_data": {}
-        }
-        result = collection.insert_one(data)
-        project_id = str(result.inserted_id)
-        
-        template_key = f"projects/{project_id}/{template.filename}"
-        values_key = f"projects/{project_id}/{values.filename}"
-        
-        s3.upload_fileobj(template.file, bucket_name, template_key)
-        s3.upload_fileobj(values.file, bucket_name, values_key)
-        
-        template_url = f"s3://{bucket_name}/{template_key}"
-        values_url = f"s3://{bucket_name}/{values_key}"
-
-        collection.update_one(
-            {"_id": ObjectId(project_id)},
-            {"$set": {"template_url": template_url, "values_url": values_url}}
-        )
+        async with svc.idempotency.claim(request.headers.get("Idempotency-Key"), "POST /api/v1/projects") as claim:
+            # 재시도도 본문을 받아 첫 요청과 같은 내용인지 확인 (같은 내용의 파일은 저장소에 이미 있어 업로드 생략)
+            if not claim.replay:
+                await svc.check_capacity()
+            with tracing.span("upload"):
+                fields, files = await stream_form_to_storage(request, svc.storage, {"template", "values"})
+            project_name = fields.get("project_name")
+            if not project_name or "template" not in files or "values" not in files:
+                raise HTTPException(status_code=422, detail="project_name, template and values are required")
+            claim.verify(
+                project_name=project_name,
+                files={name: file.digest for name, file in sorted(files.items())}
+            )
+            if claim.replay:
+                return replayed(claim.replay)
+            # 생성 후 같은 values 로 PUT 하면 변경 없음으로 판정하도록 digest 도 기록
+            with tracing.span("storage.get_values"):
+                digest = await uploaded_values_digest(svc, files["values"].key)
 
-        parameters = {
-            'type': 'CREATE',
-            'project_name': project_name,
-            'project_id': project_id
-        }
-        
-        response = requests.post(
-            jenkins_url, 
-            data=parameters, 
-            headers=header, 
-            auth=HTTPBasicAuth(jenkins_user, jenkins_token)
-        )
-        
-        if response.status_code == 201:
-            pass
-
-        end_time = datetime.now() + timedelta(seconds=30)  # 타임아웃 설정
-        while datetime.now() < end_time:
-            doc = collection.find_one({"_id": ObjectId(project_id)})
-            if doc['end_point'] != "NULL":
-                return JSONResponse(content={"project_id": project_id}, status_code=201)
-            await asyncio.sleep(1)  # 1초 후 다시 확인
-        
-        raise HTTPException(status_code=408, detail="Request Timeout: Jenkins job did not finish in time.")
+            data = {
+                "project_name": project_name,
+                **svc.artifact_fields("template", files["template"]),
+                **svc.artifact_fields("values", files["values"]),
+                "values_canonical_digest": digest,
+                "end_point": "NULL",
+                **timestamps(),
+                "meta_data": {}
+            }
+            with tracing.span("mongo.insert_project"):
+                result = await svc.collection.insert_one(data)
+            project_id = str(result.inserted_id)
+            tracing.set_attributes({"project.id": project_id, "project.name": project_name})
+            job_id = await svc.queue_job(jobs.CREATE, project_id)
+            claim.complete(202, {"job_id": job_id, "project_id": project_id})
+            return accepted(job_id, project_id)
     
+    except HTTPException:
+        raise
+    except InvalidKey as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InProgress as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Busy as e:
+        raise too_busy(e)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except NoCredentialsError:
         raise HTTPException(status_code=403, detail="AWS credentials not available")
     except PartialCredentialsError:
@@ -126,140 +258,569 @@ async def new_project(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# [GET] 단일 프로젝트 조회
-@app.get("/api/v1/projects/{project_id}", response_model=dict)
-async def get_project(project_id: str):
+def project_view(project):
+    return {
+        "project_name": project["project_name"],
+        "end_point": project.get("end_point", "NULL"),
+        "day": project["day"],
+        "meta_data": project.get("meta_data", {})
+    }
+
+class BatchFilter(BaseModel):
+    project_name: Optional[str] = None
+    status: Optional[str] = None
+    namespace: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    ids: List[str] = Field(default_factory=list)
+    filter: Optional[BatchFilter] = None
+    wait: float = 0 # meta_data 가 채워지지 않은 프로젝트를 기다릴 최대 시간 (초)
+
+def batch_query(body):
+    query = {}
+    if body.ids:
+        query["_id"] = {"$in": [ObjectId(project_id) for project_id in body.ids if ObjectId.is_valid(project_id)]}
+    if body.filter:
+        if body.filter.project_name is not None:
+            query["project_name"] = body.filter.project_name
+        if body.filter.status is not None:
+            query["meta_data.status"] = body.filter.status
+        if body.filter.namespace is not None:
+            query["meta_data.namespace"] = body.filter.namespace
+    return query
+
+def ndjson(data):
+    return orjson.dumps(data, default=str) + b"\n"
+
+# [POST] 프로젝트 일괄 조회
+# 한 번의 $in 쿼리로 읽은 뒤 NDJSON 으로 한 줄씩 전송
+# 완료된 프로젝트는 바로 보내고, 준비 중인 프로젝트는 wait 동안 hub 에서 기다렸다가 완료되는 순서대로 보냄
+# 끝까지 준비되지 않은 프로젝트는 pending: true 로 표시
+@router.post("/api/v1/projects/batch")
+async def get_projects_batch(body: BatchRequest, svc: Services = Depends(get_services)):
+    settings = svc.settings
+    if not body.ids and not body.filter:
+        raise HTTPException(status_code=400, detail="ids or filter is required")
+    if len(body.ids) > settings.batch_max_projects:
+        raise HTTPException(status_code=400, detail=f"At most {settings.batch_max_projects} ids are allowed")
+
+    wait = min(max(body.wait, 0), settings.batch_max_wait)
+    projection = {"project_name": 1, "end_point": 1, "day": 1, "meta_data": 1}
     try:
-        max_wait_time = 60 # 최대 시간
-        check_interval = 2 # 확인 주기
-
-        elapsed_time = 0
-        while elapsed_time < max_wait_time:
-            project = collection.find_one({"_id": ObjectId(project_id)})
-            if project:
-                meta_data = project.get("meta_data", {})
-                required_keys = {"helm_name", "last_deployed", "namespace", "status", "revision", "chart", "app_version"}
-
-                if meta_data and required_keys.issubset(meta_data.keys()):
-                    project_data = {
-                        "project_name": project["project_name"],
-                        "end_point": project.get("end_point", "NULL"),
-                        "day": project["day"],
-                        "meta_data": meta_data
-                    }
-                    return project_data
-                else:
-                    await asyncio.sleep(check_interval)
-                    elapsed_time += check_interval
+        projects = await svc.collection.find(batch_query(body), projection, limit=settings.batch_max_projects)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def stream():
+        found = set()
+        pending = {}
+        for project in projects:
+            project_id = str(project["_id"])
+            found.add(project_id)
+            if meta_data_ready(project) or not wait:
+                yield ndjson({"project_id": project_id, "pending": not meta_data_ready(project), **project_view(project)})
             else:
-                raise HTTPException(status_code=404, detail="Project not found")
+                pending[project_id] = project
+
+        for project_id in body.ids:
+            if project_id not in found:
+                yield ndjson({"project_id": project_id, "error": "Project not found"})
+
+        if not pending:
+            return
+
+        # 준비 중인 프로젝트 전부를 하나의 큐로 받음
+        updates = asyncio.Queue()
+        unsubscribes = []
+        for project_id in pending:
+            def on_change(doc, project_id=project_id):
+                if doc is None or meta_data_ready(doc):
+                    updates.put_nowait((project_id, doc))
+            unsubscribes.append(svc.hub.subscribe(project_id, on_change))
+
+        try:
+            # 첫 조회와 구독 사이에 완료된 프로젝트를 놓치지 않도록 한 번 더 확인
+            ids = [ObjectId(project_id) for project_id in pending]
+            for project in await svc.collection.find({"_id": {"$in": ids}}, projection):
+                if meta_data_ready(project):
+                    updates.put_nowait((str(project["_id"]), project))
+
+            deadline = asyncio.get_running_loop().time() + wait
+            while pending:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    with metrics.waiting("batch"):
+                        project_id, doc = await asyncio.wait_for(updates.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if project_id not in pending:
+                    continue
+                del pending[project_id]
+                if doc is None:
+                    yield ndjson({"project_id": project_id, "error": "Project not found"})
+                else:
+                    yield ndjson({"project_id": project_id, "pending": False, **project_view(doc)})
+        finally:
+            for unsubscribe in unsubscribes:
+                unsubscribe()
 
-        raise HTTPException(status_code=202, detail="Meta_data is not fully populated yet")
+        if pending:
+            metrics.timeout("batch")
+        for project_id, project in pending.items():
+            yield ndjson({"project_id": project_id, "pending": True, **project_view(project)})
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# [GET] 단일 프로젝트 조회
+@router.get("/api/v1/projects/{project_id}", response_model=ProjectView)
+@tracing.traced("get_project")
+async def get_project(project_id: str, svc: Services = Depends(get_services)):
+    try:
+        # 프로젝트가 없거나 meta_data 가 채워질 때까지 공용 hub 에서 대기
+        try:
+            with metrics.waiting("get_project"), tracing.span("wait_for_meta_data"):
+                project = await svc.hub.wait_for(
+                    project_id,
+                    lambda doc: doc is None or meta_data_ready(doc),
+                    svc.settings.project_wait_timeout  # 최대 시간 => PROJECT_WAIT_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            metrics.timeout("get_project")
+            raise HTTPException(status_code=202, detail="Meta_data is not fully populated yet")
+
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        return project_view(project)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse(event_id, event, data):
+    return f"id: {event_id}\nevent: {event}\ndata: {orjson.dumps(data, default=str).decode()}\n\n"
+
+# [GET] 프로젝트 배포 진행 상황 스트림 (Server-Sent Events)
+# 작업 생성 → 젠킨스 트리거 → 엔드포인트 할당 → meta_data 채워짐 → revision 증가 → 삭제 를 발생 즉시 전달
+# 같은 프로젝트를 보는 클라이언트들은 하나의 hub 구독을 공유
+@router.get("/api/v1/projects/{project_id}/events")
+async def project_events(project_id: str, svc: Services = Depends(get_services)):
+    if not await svc.cache.get(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    async def stream():
+        async for message in svc.broadcaster.subscribe(project_id, keepalive=svc.settings.sse_keepalive):
+            if message is None:
+                # 프록시가 연결을 끊지 않도록 주기적으로 주석 전송
+                yield ": keep-alive\n\n"
+                continue
+            event_id, event, data = message
+            if event == "snapshot":
+                project = data["project"]
+                if project is None:
+                    yield sse(event_id, DELETED, {})
+                    return
+                data = {"project": project_view(project)}
+            yield sse(event_id, event, data)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # [DELETE] 프로젝트 삭제
-@app.delete("/api/v1/projects/{project_id}")
-async def delete_project(project_id: str):
+@router.delete("/api/v1/projects/{project_id}")
+@tracing.traced("delete_project")
+async def delete_project(project_id: str, svc: Services = Depends(get_services)):
     try:
-        project = collection.find_one({"_id": ObjectId(project_id)})
+        with tracing.span("cache.get_project"):
+            project = await svc.cache.get(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
 
-        project_name = project.get("project_name")
+        await svc.check_capacity()
+        job_id = await svc.queue_job(jobs.DELETE, project_id)
+        await svc.cache.invalidate(project_id)
+        return accepted(job_id, project_id)
+    except HTTPException:
+        raise
+    except Busy as e:
+        raise too_busy(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        parameters = {
-            'type': 'DELETE',
-            'project_name': project_name,
-            'project_id': project_id
-        }
+# 읽은 뒤 다른 요청이 values 를 바꿈 (PATCH 는 다시 읽어서 재시도)
+class ValuesConflict(Exception):
+    pass
+
+patch_attempts = 3
 
-        response = requests.post(
-            jenkins_url, 
-            data=parameters, 
-            headers=header, 
-            auth=HTTPBasicAuth(jenkins_user, jenkins_token)
+async def get_project_doc(svc, project_id):
+    if not ObjectId.is_valid(project_id):
+        return None
+    return await svc.collection.find_one({"_id": ObjectId(project_id)})
+
+# 새 values 를 반영하고 UPDATE 작업 등록
+# 키 순서 / 주석 / 들여쓰기만 바뀐 경우 등 해석한 값이 마지막으로 배포된 값과 같으면 S3 업로드 / 젠킨스 빌드를 모두 생략
+# (저장된 값이 다르거나 배포 중인 작업이 있으면 생략하지 않음)
+# body 가 없으면 (PATCH) 합친 값을 YAML 로 저장
+# expected_url 을 주면 그 values 를 읽은 상태일 때만 반영 (values_url 은 내용 해시 경로라 내용이 같으면 같음)
+async def apply_values(svc, project, filename, new_values, body=None, expected_url=None):
+    project_id = str(project["_id"])
+    digest = helm_values.canonical_digest(new_values)
+    if await svc.values_unchanged(project, digest):
+        logger.debug("Values for project %s are unchanged, skipping build", project_id)
+        return unchanged(project_id)
+
+    with tracing.span("upload"):
+        file = await store_blob(svc.storage, filename, body if body is not None else helm_values.dump(new_values))
+
+    # 수정 후 문서를 바로 돌려받아 추가 조회를 생략
+    with tracing.span("mongo.update_project"):
+        query = {"_id": project["_id"]}
+        if expected_url is not None:
+            query["values_url"] = expected_url
+        updated = await svc.collection.find_one_and_update(
+            query,
+            {"$set": {**timestamps(), **svc.artifact_fields("values", file), "values_canonical_digest": digest}} # 생성 일자 업데이트
         )
+    await svc.cache.invalidate(project_id)
+
+    # Jenkins Job 대기열 등록 (앞선 빌드가 끝난 뒤 실행, 대기 중인 UPDATE 와 합쳐짐)
+    if not updated:
+        if expected_url is not None and await svc.collection.find_one({"_id": project["_id"]}, {"_id": 1}):
+            raise ValuesConflict()
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    job_id = await svc.queue_job(jobs.UPDATE, project_id)
+    return accepted(job_id, project_id)
 
-        if response.status_code != 201:
-            raise HTTPException(status_code=500, detail="Failed to trigger Jenkins job")
+# [PUT] 프로젝트 수정하기
+@router.put("/api/v1/projects/{project_id}", openapi_extra=form_schema(("values",)))
+@tracing.traced("update_project")
+async def update_project(project_id: str, request: Request, svc: Services = Depends(get_services)):
+    try:
+        # 배포된 values 와 비교하므로 캐시가 아니라 DB 에서 읽음
+        with tracing.span("mongo.get_project"):
+            project = await get_project_doc(svc, project_id)
+        if not project:
+            raise HTTPException(status_code=404, detail="Project not found")
+        await svc.check_capacity()
 
-        max_wait_time = 60 # 최대 시간
-        wait_interval = 2 # 확인 주기
+        # values 는 작으므로 메모리로 받아 해석한 뒤 배포된 값과 비교
+        _, files = await read_form(request, {"values"}, svc.settings.values_max_size)
+        if "values" not in files:
+            raise HTTPException(status_code=422, detail="values is required")
+        file = files["values"]
+        return await apply_values(svc, project, file.filename, helm_values.parse(file.body), file.body)
 
-        elapsed_time = 0
-        while elapsed_time < max_wait_time:
-            project = collection.find_one({"_id": ObjectId(project_id)})
+    except HTTPException:
+        raise
+    except Busy as e:
+        raise too_busy(e)
+    except (UploadError, InvalidValues) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Failed to update project %s: %s", project_id, e)
+        raise HTTPException(status_code=500, detail="Failed to update project")
+
+# [PATCH] values 일부만 수정하기 (JSON Merge Patch, RFC 7386: null 은 키 삭제)
+@router.patch(
+    "/api/v1/projects/{project_id}/values",
+    openapi_extra={"requestBody": {"required": True, "content": {"application/merge-patch+json": {"schema": {"type": "object"}}}}}
+)
+@tracing.traced("patch_values")
+async def patch_values(project_id: str, request: Request, svc: Services = Depends(get_services)):
+    try:
+        await svc.check_capacity()
+        body = await read_body(request, svc.settings.values_max_size)
+        try:
+            patch = orjson.loads(body)
+        except orjson.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Patch must be valid JSON")
+        if not isinstance(patch, dict):
+            raise HTTPException(status_code=400, detail="Patch must be a JSON object")
+
+        # 읽기 → 합치기 → 쓰기 사이에 다른 수정이 끼어들면 다시 읽어서 합침
+        for _ in range(patch_attempts):
+            with tracing.span("mongo.get_project"):
+                project = await get_project_doc(svc, project_id)
             if not project:
-                return {"message": "Project deleted successfully"}
-            await asyncio.sleep(wait_interval)
-            elapsed_time += wait_interval
+                raise HTTPException(status_code=404, detail="Project not found")
+            with tracing.span("storage.get_values"):
+                current = await svc.current_values(project)
+            if current is None:
+                raise HTTPException(status_code=409, detail="Project has no stored values")
+            filename = project.get("values_filename") or "values.yaml"
+            try:
+                return await apply_values(
+                    svc, project, filename, helm_values.merge_patch(current, patch), expected_url=project["values_url"]
+                )
+            except ValuesConflict:
+                continue
+        raise HTTPException(status_code=409, detail="Values were changed by another request, retry")
 
-        raise HTTPException(status_code=500, detail="Timed out waiting for project deletion")
+    except HTTPException:
+        raise
+    except Busy as e:
+        raise too_busy(e)
+    except BodyTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (UploadError, InvalidValues) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception("Failed to patch values of project %s: %s", project_id, e)
+        raise HTTPException(status_code=500, detail="Failed to update project")
+
+class UploadFileSpec(BaseModel):
+    filename: Optional[str] = None
+    size: int
+    sha256: str  # 파일 내용의 sha256 (hex), presigned URL 서명에 들어가 다른 내용은 S3 가 거절
+
+class UploadRequest(BaseModel):
+    project_name: Optional[str] = None  # 생성할 때만
+    files: Dict[str, UploadFileSpec]
+
+class FinalizeRequest(BaseModel):
+    etags: Dict[str, str] = Field(default_factory=dict)  # 브라우저가 PUT 응답으로 받은 ETag (선택)
+
+async def begin_upload(svc, job_type, project_id, body, required, project_name=None):
+    try:
+        await svc.check_capacity()
+        files = {name: spec.model_dump() for name, spec in body.files.items()}
+        return await svc.uploads.begin(job_type, project_id, files, required, project_name=project_name)
+    except Busy as e:
+        raise too_busy(e)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PresignUnsupported as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except NoCredentialsError:
+        raise HTTPException(status_code=403, detail="AWS credentials not available")
+    except PartialCredentialsError:
+        raise HTTPException(status_code=403, detail="Incomplete AWS credentials")
+    except BotoCoreError as e:
+        raise HTTPException(status_code=500, detail=f"AWS error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# [PUT] 프로젝트 수정하기
-@app.put("/api/v1/projects/{project_id}")
-async def update_project(
-    project_id: str, 
-    values: UploadFile = File(...)
-):
+# [POST] 브라우저 직접 업로드 시작 (프로젝트 생성)
+# template / values 의 presigned PUT URL 을 projects/{project_id}/ 아래로 발급, 파일은 API 서버를 거치지 않음
+@router.post("/api/v1/projects/uploads", status_code=201)
+@tracing.traced("begin_create_upload")
+async def begin_create_upload(body: UploadRequest, svc: Services = Depends(get_services)):
+    if not body.project_name:
+        raise HTTPException(status_code=422, detail="project_name is required")
+    return await begin_upload(
+        svc, jobs.CREATE, str(ObjectId()), body, ("template", "values"), project_name=body.project_name
+    )
+
+# [POST] 브라우저 직접 업로드 시작 (values 수정)
+@router.post("/api/v1/projects/{project_id}/uploads", status_code=201)
+@tracing.traced("begin_update_upload")
+async def begin_update_upload(project_id: str, body: UploadRequest, svc: Services = Depends(get_services)):
+    if not await svc.cache.get(project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    return await begin_upload(svc, jobs.UPDATE, project_id, body, ("values",))
+
+# 해석할 수 없는 values 는 None (배포된 값과 비교하지 않고 항상 빌드)
+async def uploaded_values_digest(svc, key):
+    body = await svc.storage.get_object(key)
     try:
-        # S3에서 해당 프로젝트 ID의 values.yaml 파일 삭제
-        s3.delete_object(Bucket=bucket_name, Key=f"projects/{project_id}/values.yaml")
-
-        # 업로드된 파일 저장
-        values_key = f"projects/{project_id}/{values.filename}"
-        s3.upload_fileobj(values.file, bucket_name, values_key)
-        
-        values_url = f"s3://{bucket_name}/{values_key}"
-        current_time = datetime.now(tz).strftime("%Y:%m:%d:%H:%M:%S") # 생성 일자 업데이트
-        
-        collection.update_one(
-            {"_id": ObjectId(project_id)},
-            {"$set": {"day": current_time, "values_url": values_url}}
-        )
-        
-        # Jenkins Job 트리거
-        project = collection.find_one({"_id": ObjectId(project_id)})
+        return None if body is None else helm_values.canonical_digest(helm_values.parse(body))
+    except InvalidValues:
+        return None
+
+# 확인된 업로드를 프로젝트 문서에 반영하고 작업 등록
+async def apply_upload(svc, session):
+    project_id = session["project_id"]
+    files = uploaded_files(session)
+    if session["type"] == jobs.CREATE:
+        with tracing.span("storage.get_values"):
+            digest = await uploaded_values_digest(svc, files["values"].key)
+        data = {
+            "_id": ObjectId(project_id),
+            "project_name": session["project_name"],
+            **svc.artifact_fields("template", files["template"]),
+            **svc.artifact_fields("values", files["values"]),
+            "values_canonical_digest": digest,
+            "end_point": "NULL",
+            **timestamps(),
+            "meta_data": {}
+        }
+        try:
+            with tracing.span("mongo.insert_project"):
+                await svc.collection.insert_one(data)
+        except DuplicateKeyError:
+            pass  # 앞선 finalize 가 문서를 넣은 뒤 멈춘 경우
+    else:
+        # 올라온 values 의 digest 도 함께 바꿔야 이전 values 로 다시 PUT 했을 때 변경 없음으로 잘못 판정하지 않음
+        with tracing.span("storage.get_values"):
+            digest = await uploaded_values_digest(svc, files["values"].key)
+        with tracing.span("mongo.update_project"):
+            project = await svc.collection.find_one_and_update(
+                {"_id": ObjectId(project_id)},
+                {"$set": {
+                    **timestamps(), **svc.artifact_fields("values", files["values"]), "values_canonical_digest": digest
+                }}
+            )
+        await svc.cache.invalidate(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="Project not found")
+    return await svc.queue_job(session["type"], project_id)
+
+# [POST] 직접 업로드 완료
+# HEAD 로 파일마다 크기 / ETag 를 확인한 뒤 프로젝트에 반영하고 젠킨스 작업 등록
+# 같은 업로드를 다시 finalize 하면 처음 등록한 작업을 돌려줌
+@router.post("/api/v1/uploads/{upload_id}/finalize")
+@tracing.traced("finalize_upload")
+async def finalize_upload(
+    upload_id: str, body: Optional[FinalizeRequest] = None, svc: Services = Depends(get_services)
+):
+    try:
+        with tracing.span("verify_upload"):
+            session = await svc.uploads.claim(upload_id, body.etags if body else None)
+        tracing.set_attributes({"project.id": session["project_id"]})
+        if session["state"] == FINALIZED:
+            return accepted(session["job_id"], session["project_id"])
+
+        try:
+            await svc.check_capacity()
+            job_id = await apply_upload(svc, session)
+        except BaseException:
+            await svc.uploads.release(session)
+            raise
+        await svc.uploads.complete(session, job_id)
+        return accepted(job_id, session["project_id"])
+    except HTTPException:
+        raise
+    except SessionNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except SessionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Busy as e:
+        raise too_busy(e)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BotoCoreError as e:
+        raise HTTPException(status_code=500, detail=f"AWS error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        project_name = project.get("project_name")
-        meta_data = project.get("meta_data")
-        current_revision = meta_data.get("revision")
+# [GET] 프로젝트 캐시 통계 (크기 조정용)
+@router.get("/api/v1/cache/stats")
+async def get_cache_stats(svc: Services = Depends(get_services)):
+    return svc.cache.stats()
 
-        parameters = {
-            'type': 'UPDATE',
-            'project_name': project_name,
-            'project_id': project_id
-        }
+# [GET] 저장소 작업별 호출 통계
+@router.get("/api/v1/storage/stats")
+async def get_storage_stats(svc: Services = Depends(get_services)):
+    return svc.storage.metrics.snapshot()
 
-        response = requests.post(
-            jenkins_url, 
-            data=parameters, 
-            headers=header, 
-            auth=HTTPBasicAuth(jenkins_user, jenkins_token)
-        )
+# [GET] 젠킨스 빌드 대기열 통계 (대기 수 / 진행 중 / 대기 시간)
+@router.get("/api/v1/dispatcher/stats")
+async def get_dispatcher_stats(svc: Services = Depends(get_services)):
+    return svc.dispatcher.stats()
 
-        if response.status_code != 201:
-            raise HTTPException(status_code=500, detail="Failed to trigger Jenkins job")
-        
-        # 업데이트 완료 체크하기
-        max_wait_time = 60 # 최대 시간
-        wait_interval = 2 # 확인 주기
-
-        elapsed_time = 0 # 처음 시간
-        while elapsed_time < max_wait_time:
-            project = collection.find_one({"_id": ObjectId(project_id)})
-            meta_data = project.get("meta_data")
-            revision = meta_data.get("revision")
-            if revision > current_revision:
-                return JSONResponse(content="PUT request successful", status_code=200)
-            await asyncio.sleep(wait_interval)
-            elapsed_time += wait_interval
+# [GET] 프로젝트 배포 이력 (최신 revision 순, 커서 페이지네이션)
+# 다음 페이지 커서는 X-Next-Cursor 헤더로 전달
+@router.get("/api/v1/projects/{project_id}/revisions", response_model=List[RevisionView])
+async def get_revisions(
+    project_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    svc: Services = Depends(get_services)
+):
+    # 페이지 크기 => REVISION_PAGE_SIZE / REVISION_MAX_PAGE_SIZE
+    limit = svc.settings.revision_page_size if limit is None else limit
+    if not 1 <= limit <= svc.settings.revision_max_page_size:
+        raise HTTPException(status_code=422, detail=f"limit must be between 1 and {svc.settings.revision_max_page_size}")
+    try:
+        if not await svc.cache.get(project_id):
+            raise HTTPException(status_code=404, detail="Project not found")
+        revisions, cursor = await svc.revisions.list(project_id, limit, after)
+        if cursor:
+            response.headers["X-Next-Cursor"] = cursor
+        return revisions
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Failed to list revisions of project %s: %s", project_id, e)
+        raise HTTPException(status_code=500, detail="Failed to list revisions")
 
+# [GET] 작업 진행 상태 조회
+@router.get("/api/v1/jobs/{job_id}", response_model=JobView)
+async def get_job(job_id: str, svc: Services = Depends(get_services)):
+    try:
+        job = await jobs.get_job(svc.job_collection, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return jobs.to_view(job)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to update project")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 설정(환경 변수 / .env)으로 앱 구성
+# 몽고 / S3 / 젠킨스 클라이언트는 가져올 때가 아니라 startup 에서 만듦
+def create_app(settings=None, jenkins_transport=None):
+    settings = settings or Settings.from_env()
+    logging.basicConfig(level=settings.log_level.upper())
+
+    # METRICS_ENABLED=false 이면 계측 생략 (/metrics 는 404)
+    metrics.create_metrics(settings)
+    # TRACING_EXPORTER=otlp / file 이면 단계별 span 기록 (기본 none)
+    tracing.create_tracing(settings)
+
+    # 워커마다 시작할 때 클라이언트를 만들고, 종료할 때 진행 중인 빌드를 기다린 뒤 정리
+    @asynccontextmanager
+    async def lifespan(app):
+        services = app.state.services
+        monitor = app.state.loop_monitor
+        if monitor is not None:
+            monitor.start()
+        await services.start()
+        try:
+            yield
+        finally:
+            await services.drain(settings.shutdown_grace_period)
+            await services.stop()
+            if monitor is not None:
+                await monitor.stop()
+            tracing.shutdown()
+
+    # 응답은 기본으로 orjson 으로 직렬화
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.state.settings = settings
+    app.state.services = Services(settings, jenkins_transport=jenkins_transport)
+    # LOOP_MONITOR_ENABLED=true 이면 루프 지연 측정 / 블로킹 호출 스택 기록 (/debug/loop)
+    app.state.loop_monitor = create_loop_monitor(settings)
+
+    # GZIP_MIN_SIZE 바이트 이상의 JSON 응답 압축 (스트리밍 응답은 제외)
+    if settings.gzip_min_size > 0:
+        app.add_middleware(CompressionMiddleware, minimum_size=settings.gzip_min_size, level=settings.gzip_level)
+
+    # 라우트 / 상태 코드별 요청 지연 시간
+    if metrics.enabled():
+        app.add_middleware(metrics.MetricsMiddleware)
+
+    # CORS 미들웨어 설정
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=list(settings.cors_origins),  # 허용하는 접속 도메인 => CORS_ORIGINS
+        allow_credentials=True,
+        allow_methods=["*"],  # 모든 HTTP 메소드 허용
+        allow_headers=["*"],  # 모든 HTTP 헤더 허용
+    )
+
+    app.include_router(router)
+    return app
+
+# uvicorn api:app
+app = create_app()
@@ -0,0 +1,82 @@
+from datetime import datetime
+from urllib.parse import parse_qs
+from bson import ObjectId
+import asyncio
+import itertools
+import httpx
+import pytz
+
+tz = pytz.timezone('Asia/Seoul')
+
+# 프로세스 안에서 동작하는 젠킨스 대역 (httpx 트랜스포트)
+# 빌드 요청을 받으면 delay 초 뒤 파이프라인처럼 프로젝트 문서에 end_point / meta_data 를 기록
+# 기록은 동기 컬렉션에 직접 하므로 API 의 DB 호출 수에는 포함되지 않음
+class FakeJenkins:
+    def __init__(self, collection=None, delay=1.0, base_url="http://jenkins.bench"):
+        self.collection = collection
+        self.delay = delay
+        self.base_url = base_url
+        self.builds = {}  # 번호 -> {"parameters", "done"}
+        self._numbers = itertools.count(1)
+        self._tasks = set()
+
+    @property
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request):
+        path = request.url.path
+        if path.startswith("/crumbIssuer"):
+            return httpx.Response(404)
+        if path.endswith("/buildWithParameters"):
+            parameters = {key: values[0] for key, values in parse_qs(request.content.decode()).items()}
+            number = next(self._numbers)
+            self.builds[number] = {"parameters": parameters, "done": False}
+            task = asyncio.create_task(self._pipeline(number, parameters))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return httpx.Response(201, headers={"Location": f"{self.base_url}/queue/item/{number}/"})
+        if path.startswith("/queue/item/"):
+            number = int(path.split("/")[3])
+            return httpx.Response(200, json={
+                "id": number, "cancelled": False,
+                "executable": {"number": number, "url": f"{self.base_url}/job/bench/{number}/"}
+            })
+        if path.startswith("/job/bench/"):
+            number = int(path.split("/")[3])
+            done = self.builds[number]["done"]
+            return httpx.Response(200, json={
+                "number": number, "building": not done,
+                "result": "SUCCESS" if done else None, "duration": int(self.delay * 1000)
+            })
+        return httpx.Response(404)
+
+    async def _pipeline(self, number, parameters):
+        await asyncio.sleep(self.delay)
+        project_id = ObjectId(parameters["project_id"])
+        if parameters["type"] == "DELETE":
+            self.collection.delete_one({"_id": project_id})
+        else:
+            project = self.collection.find_one({"_id": project_id}) or {}
+            revision = (project.get("meta_data") or {}).get("revision", 0) + 1
+            self.collection.update_one({"_id": project_id}, {"$set": {
+                "end_point": f"{parameters['project_name']}.bench.local",
+                "meta_data": meta_data(parameters["project_name"], revision)
+            }})
+        self.builds[number]["done"] = True
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+def meta_data(project_name, revision):
+    return {
+        "helm_name": project_name,
+        "last_deployed": datetime.now(tz).isoformat(),
+        "namespace": "bench",
+        "status": "deployed",
+        "revision": revision,
+        "chart": "bench-0.1.0",
+        "app_version": "1.0.0"
+    }
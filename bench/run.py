@@ -0,0 +1,289 @@
+# API 부하 테스트 / 벤치마크
+# 몽고는 메모리 저장소(DB_BACKEND=memory), S3 는 로컬 디렉터리(STORAGE_BACKEND=local),
+# 젠킨스는 프로세스 내부 대역(FakeJenkins)으로 바꿔서 외부 서비스 없이 실행
+#
+# 실행 (저장소 루트에서):
+#   python bench/run.py --scenario mixed --requests 2000 --concurrency 50
+#   python bench/run.py --scenario all --json results.json
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ("list", "create", "update", "mixed")
+
+def configure(storage_root):
+    os.environ.update({
+        "DB_BACKEND": "memory",
+        "DB_NAME": "bench",
+        "COL_NAME": "projects",
+        "STORAGE_BACKEND": "local",
+        "STORAGE_LOCAL_ROOT": storage_root,
+        "JENKINS_URL": "http://jenkins.bench",
+        "JENKINS_JOB": "bench",
+        "JENKINS_POLL_INTERVAL": "0.5",
+        "SHUTDOWN_GRACE_PERIOD": "0",
+    })
+    os.environ.setdefault("TRACING_EXPORTER", "none")
+
+# ---- 측정 ----
+
+_in_request = ContextVar("in_request", default=False)
+
+# AsyncCollection 호출 수를 요청 처리 중 / 백그라운드(hub 폴링, 작업 감시 등)로 나눠 셈
+class DbOps:
+    def __init__(self):
+        self.request = 0
+        self.background = 0
+
+    def install(self, db):
+        original = db.AsyncCollection._run
+        counter = self
+
+        async def counted(collection, op, fn, *args, **kwargs):
+            if _in_request.get():
+                counter.request += 1
+            else:
+                counter.background += 1
+            return await original(collection, op, fn, *args, **kwargs)
+
+        db.AsyncCollection._run = counted
+
+db_ops = DbOps()
+
+# 주기적으로 잠들었다 깨어난 시각의 지연 = 이벤트 루프가 막힌 시간
+async def sample_loop_lag(samples, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+# ---- 시나리오 ----
+
+class State:
+    def __init__(self, ready_ids, hot_ids):
+        self.ready_ids = ready_ids  # meta_data 가 채워진 프로젝트
+        self.hot_ids = hot_ids  # update 시나리오에서 반복 수정하는 프로젝트
+        self.created = 0
+
+def form(files, fields=None):
+    return {"data": fields or {}, "files": {name: (f"{name}.yaml", body) for name, body in files.items()}}
+
+async def list_projects(client, state, rng):
+    return await client.get("/api/v1/projects", params={"limit": 50})
+
+async def list_projects_fields(client, state, rng):
+    return await client.get("/api/v1/projects", params={"limit": 50, "fields": "project_name,end_point"})
+
+async def get_project(client, state, rng):
+    return await client.get(f"/api/v1/projects/{rng.choice(state.ready_ids)}")
+
+async def batch_projects(client, state, rng):
+    ids = rng.sample(state.ready_ids, min(20, len(state.ready_ids)))
+    return await client.post("/api/v1/projects/batch", json={"ids": ids})
+
+async def create_project(client, state, rng):
+    state.created += 1
+    template = f"apiVersion: v2\nname: bench\nversion: 0.1.{rng.randrange(20)}\n".encode()
+    values = f"replicaCount: {rng.randrange(1, 5)}\nimage: bench:{state.created}\n".encode()
+    return await client.post(
+        "/api/v1/projects", **form({"template": template, "values": values}, {"project_name": f"bench-{state.created}"})
+    )
+
+async def update_project(client, state, rng):
+    values = f"replicaCount: {rng.randrange(1, 10)}\nnonce: {rng.random()}\n".encode()
+    return await client.put(f"/api/v1/projects/{rng.choice(state.hot_ids)}", **form({"values": values}))
+
+# 시나리오별 (작업, 가중치)
+MIXES = {
+    "list": [(list_projects, 50), (list_projects_fields, 20), (get_project, 30)],
+    "create": [(create_project, 1)],
+    "update": [(update_project, 1)],
+    "mixed": [
+        (list_projects, 45), (list_projects_fields, 10), (get_project, 20),
+        (batch_projects, 5), (create_project, 10), (update_project, 10)
+    ],
+}
+
+# ---- 실행 ----
+
+def seed(collection, count):
+    from bench.fake_jenkins import meta_data
+    from bson import ObjectId
+    import pytz
+    tz = pytz.timezone('Asia/Seoul')
+    start = datetime.now(tz) - timedelta(days=1)
+    ids = []
+    for i in range(count):
+        day_at = start + timedelta(seconds=i)
+        project_id = ObjectId()
+        collection.insert_one({
+            "_id": project_id,
+            "project_name": f"seed-{i}",
+            "template_url": "file:///dev/null",
+            "values_url": "file:///dev/null",
+            "end_point": f"seed-{i}.bench.local",
+            "day": day_at.strftime("%Y:%m:%d:%H:%M:%S"),
+            "day_at": day_at,
+            "meta_data": meta_data(f"seed-{i}", 1)
+        })
+        ids.append(str(project_id))
+    return ids
+
+async def run_scenario(app, name, project_ids, args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    state = State(project_ids, project_ids[:args.hot_projects])
+    ops = MIXES[name]
+    choices = [op for op, _ in ops]
+    weights = [weight for _, weight in ops]
+
+    latencies = []
+    statuses = {}
+    request_ops_before = db_ops.request
+    background_ops_before = db_ops.background
+    remaining = iter(range(args.requests))
+
+    lag = []
+    sampler = asyncio.create_task(sample_loop_lag(lag))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api.bench", timeout=120) as client:
+        async def worker():
+            token = _in_request.set(True)
+            try:
+                for _ in remaining:
+                    op = rng.choices(choices, weights)[0]
+                    start = time.perf_counter()
+                    try:
+                        response = await op(client, state, rng)
+                        status = response.status_code
+                    except Exception as e:
+                        status = type(e).__name__
+                    latencies.append(time.perf_counter() - start)
+                    statuses[status] = statuses.get(status, 0) + 1
+            finally:
+                _in_request.reset(token)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    sampler.cancel()
+    await asyncio.gather(sampler, return_exceptions=True)
+
+    count = len(latencies)
+    return {
+        "scenario": name,
+        "requests": count,
+        "concurrency": args.concurrency,
+        "seconds": elapsed,
+        "rps": count / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": max(latencies, default=0) * 1000,
+        },
+        "loop_lag_ms": {
+            "p50": percentile(lag, 50) * 1000,
+            "p99": percentile(lag, 99) * 1000,
+            "max": max(lag, default=0) * 1000,
+        },
+        "db_ops_per_request": (db_ops.request - request_ops_before) / count if count else 0.0,
+        "db_ops_background": db_ops.background - background_ops_before,
+        "status": {str(key): value for key, value in sorted(statuses.items(), key=lambda item: str(item[0]))},
+        "dispatcher": app.state.services.dispatcher.stats(),
+    }
+
+# 앞 시나리오가 남긴 빌드가 다음 시나리오의 대기열/429 에 섞이지 않도록 디스패처가 빌 때까지 대기
+async def drain(services, timeout):
+    dispatcher = services.dispatcher
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while dispatcher.queued() or dispatcher.in_flight():
+        if loop.time() > deadline:
+            print(f"   dispatcher not drained after {timeout}s "
+                  f"({dispatcher.queued()} queued, {dispatcher.in_flight()} in flight)")
+            return
+        await asyncio.sleep(0.1)
+
+async def main(args):
+    storage_root = tempfile.mkdtemp(prefix="cloudcrew-bench-")
+    configure(storage_root)
+
+    import db_utils as db
+    db_ops.install(db)
+
+    import api
+    from bench.fake_jenkins import FakeJenkins
+
+    # 클라이언트는 startup 에서 만들어지므로 컬렉션은 그 뒤에 연결
+    fake = FakeJenkins(delay=args.jenkins_delay)
+    app = api.create_app(jenkins_transport=fake.transport)
+    results = []
+    async with app.router.lifespan_context(app):
+        services = app.state.services
+        fake.collection = services.collection.collection
+        project_ids = seed(services.collection.collection, args.projects)
+        while not services.ready:
+            await asyncio.sleep(0.01)
+
+        try:
+            names = SCENARIOS if args.scenario == "all" else (args.scenario,)
+            for name in names:
+                await drain(services, args.drain_timeout)
+                result = await run_scenario(app, name, project_ids, args)
+                results.append(result)
+                report(result)
+        finally:
+            await fake.close()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+
+def report(result):
+    latency = result["latency_ms"]
+    lag = result["loop_lag_ms"]
+    print(f"== {result['scenario']} ({result['requests']} requests, concurrency {result['concurrency']})")
+    print(f"   rps            {result['rps']:.1f}")
+    print(f"   latency ms     p50 {latency['p50']:.1f}  p95 {latency['p95']:.1f}  p99 {latency['p99']:.1f}  max {latency['max']:.1f}")
+    print(f"   loop lag ms    p50 {lag['p50']:.2f}  p99 {lag['p99']:.2f}  max {lag['max']:.2f}")
+    print(f"   db ops/request {result['db_ops_per_request']:.2f}  (background {result['db_ops_background']})")
+    print(f"   status         {result['status']}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CloudCrew API benchmark")
+    parser.add_argument("--scenario", choices=(*SCENARIOS, "all"), default="mixed")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--projects", type=int, default=1000, help="seeded projects with meta_data ready")
+    parser.add_argument("--hot-projects", type=int, default=10, help="projects targeted by the update scenario")
+    parser.add_argument("--jenkins-delay", type=float, default=1.0, help="seconds before the fake pipeline writes back")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--drain-timeout", type=float, default=300,
+                        help="max seconds to wait for queued builds before each scenario")
+    parser.add_argument("--json", help="write results to this file")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
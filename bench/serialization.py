@@ -0,0 +1,83 @@
+# 응답 직렬화 마이크로 벤치마크
+# 가장 큰 목록 응답(ID 목록 / fields 목록 / 큰 meta_data)을 기존 방식(jsonable_encoder + JSONResponse)과
+# orjson(ORJSONResponse) 으로 직렬화하는 시간, 응답 모델 검증 시간, gzip 전후 크기를 비교
+#
+# 실행 (저장소 루트에서):
+#   python bench/serialization.py --projects 500 --repeat 200
+from datetime import datetime, timedelta
+import argparse
+import gzip
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def make_projects(count, meta_keys):
+    from bench.fake_jenkins import meta_data
+    from bson import ObjectId
+    start = datetime(2024, 1, 1)
+    projects = []
+    for i in range(count):
+        data = meta_data(f"project-{i}", i)
+        data.update({f"label_{k}": f"value-{i}-{k}" * 4 for k in range(meta_keys)})
+        projects.append({
+            "project_id": str(ObjectId()),
+            "project_name": f"project-{i}",
+            "end_point": f"project-{i}.cloudcrew.site",
+            "day": (start + timedelta(minutes=i)).strftime("%Y:%m:%d:%H:%M:%S"),
+            "template_url": f"s3://cc-helm-templates/blobs/{i:064x}",
+            "values_url": f"s3://cc-helm-templates/blobs/{i + 1:064x}",
+            "meta_data": data,
+        })
+    return projects
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(args):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from pydantic import TypeAdapter
+    from typing import List
+    from api import ProjectSummary, ProjectView
+
+    projects = make_projects(args.projects, args.meta_keys)
+    ids = [project["project_id"] for project in projects]
+    single = {key: projects[0][key] for key in ("project_name", "end_point", "day", "meta_data")}
+    single["meta_data"] = {**single["meta_data"], **{f"big_{k}": "x" * 64 for k in range(args.big_meta_keys)}}
+
+    cases = [
+        ("ids", ids, TypeAdapter(List[str])),
+        ("fields", projects, TypeAdapter(List[ProjectSummary])),
+        ("project", single, TypeAdapter(ProjectView)),
+    ]
+
+    print(f"{'response':<10} {'json ms':>9} {'orjson ms':>10} {'model ms':>9} {'bytes':>9} {'gzip':>8} {'gzip ms':>8}")
+    for name, data, adapter in cases:
+        legacy, body = timed(lambda: JSONResponse(jsonable_encoder(data)).body, args.repeat)
+        fast, fast_body = timed(lambda: ORJSONResponse(data).body, args.repeat)
+        model, _ = timed(lambda: adapter.dump_python(adapter.validate_python(data), mode="json"), args.repeat)
+        compress, compressed = timed(lambda: gzip.compress(fast_body, compresslevel=args.gzip_level), args.repeat)
+        print(
+            f"{name:<10} {legacy * 1000:>9.3f} {fast * 1000:>10.3f} {model * 1000:>9.3f} "
+            f"{len(body):>9} {len(compressed):>8} {compress * 1000:>8.3f}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CloudCrew response serialization benchmark")
+    parser.add_argument("--projects", type=int, default=500, help="list size (PROJECT_MAX_PAGE_SIZE)")
+    parser.add_argument("--meta-keys", type=int, default=10, help="extra meta_data keys per listed project")
+    parser.add_argument("--big-meta-keys", type=int, default=2000, help="extra meta_data keys for the single project")
+    parser.add_argument("--gzip-level", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=100)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,150 @@
+from jenkins_client import JenkinsError
+import asyncio
+import logging
+import metrics
+import time
+
+logger = logging.getLogger(__name__)
+
+SUCCESS = "SUCCESS"
+CANCELLED = "CANCELLED"  # 빌드 시작 전 큐에서 취소됨
+EXPIRED = "EXPIRED"  # JENKINS_TRACK_MAX_AGE 안에 결과를 받지 못함 (추적 중단)
+LOST = "LOST"  # 빌드 번호를 받기 전에 큐 항목이 사라짐 (젠킨스 재시작 등, 추적 중단)
+
+# 젠킨스 빌드 하나 (합쳐진 UPDATE 처럼 여러 작업이 같은 빌드를 기다릴 수 있음)
+class Build:
+    def __init__(self, queue_url, url=None, max_age=3600):
+        self.queue_url = queue_url
+        self.url = url
+        self.number = None
+        self.result = None
+        self.duration = None  # 초
+        self.job_ids = set()
+        self.expires = time.monotonic() + max_age
+        self.missing_since = None  # 큐 항목이 404 를 돌려주기 시작한 시각
+
+# 진행 중인 모든 젠킨스 빌드를 하나의 루프에서 폴링
+# 큐 항목(Location 헤더) → 빌드 번호 → 빌드 결과 순서로 따라가며 시작/종료 시 리스너 호출
+class BuildTracker:
+    def __init__(self, jenkins, interval=2, max_age=3600, lost_grace=60):
+        self.jenkins = jenkins
+        self.interval = interval
+        self.max_age = max_age
+        self.lost_grace = lost_grace
+        self.polls = 0
+        self._builds = {}  # queue_url -> Build
+        self._jobs = {}  # job_id -> queue_url
+        self._listeners = []  # (build) 빌드 번호를 받았을 때와 결과가 나왔을 때
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 다시 시작하면 작업 감시자가 진행 중인 작업을 다시 등록
+        self._builds.clear()
+        self._jobs.clear()
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def track(self, job_id, queue_url, build_url=None):
+        build = self._builds.get(queue_url)
+        if build is None:
+            build = Build(queue_url, build_url, self.max_age)
+            self._builds[queue_url] = build
+        build.job_ids.add(job_id)
+        self._jobs[job_id] = queue_url
+
+    def tracking(self):
+        return len(self._builds)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self._builds:
+                try:
+                    await self.poll()
+                except Exception as e:
+                    logger.warning("Build tracker poll error: %s", e)
+
+    async def poll(self):
+        self.polls += 1
+        metrics.poll("jenkins_builds")
+        current = time.monotonic()
+        for build in list(self._builds.values()):
+            if build.expires < current:
+                # 결과를 기다리던 쪽(디스패처 슬롯 등)이 계속 기다리지 않도록 종료로 알림
+                self._finish(build, EXPIRED, None)
+        await asyncio.gather(*(self._poll_build(build) for build in list(self._builds.values())))
+
+    async def _poll_build(self, build):
+        try:
+            if build.url is None:
+                item = await self.jenkins.api_json(build.queue_url, tree="cancelled,executable[number,url]")
+                if item is None:
+                    # 젠킨스는 끝난 큐 항목을 잠시만 보관하므로 재시작 / 긴 장애 뒤에는 빌드 번호를 알 수 없음
+                    # lost_grace 초 넘게 없으면 max_age 까지 기다리지 않고 종료로 알림 (디스패처 슬롯 반환)
+                    current = time.monotonic()
+                    if build.missing_since is None:
+                        build.missing_since = current
+                    elif current - build.missing_since > self.lost_grace:
+                        self._finish(build, LOST, None)
+                    return
+                build.missing_since = None
+                if item.get("cancelled"):
+                    self._finish(build, CANCELLED, None)
+                    return
+                executable = item.get("executable")
+                if not executable:
+                    return
+                build.number = executable["number"]
+                build.url = executable["url"]
+                self._notify(build)
+
+            info = await self.jenkins.api_json(build.url, tree="number,building,result,duration")
+            if info is None or info.get("building") or info.get("result") is None:
+                return
+            build.number = info.get("number", build.number)
+            self._finish(build, info["result"], info.get("duration", 0) / 1000)
+        except JenkinsError as e:
+            # 다음 주기에 다시 시도 (끝내 응답이 없으면 작업 감시자의 타임아웃으로 종료)
+            logger.warning("Build tracker error: %s", e)
+        except (KeyError, ValueError, TypeError) as e:
+            # 프록시의 HTML 응답, number 없는 executable 등 예상과 다른 응답도 다음 주기에 다시 시도
+            logger.warning("Unexpected Jenkins response for %s: %r", build.url or build.queue_url, e)
+
+    def _finish(self, build, result, duration):
+        build.result = result
+        build.duration = duration
+        self._drop(build)
+        self._notify(build)
+
+    def _drop(self, build):
+        if self._builds.get(build.queue_url) is build:
+            del self._builds[build.queue_url]
+        for job_id in build.job_ids:
+            self._jobs.pop(job_id, None)
+
+    def _notify(self, build):
+        for listener in self._listeners:
+            try:
+                listener(build)
+            except Exception as e:
+                logger.exception("Build listener error: %s", e)
+
+# JENKINS_POLL_INTERVAL: 빌드 상태 조회 주기 / JENKINS_TRACK_MAX_AGE: 결과를 기다리는 최대 시간 (초)
+# JENKINS_QUEUE_LOST_GRACE: 큐 항목이 사라진 뒤 빌드를 잃어버린 것으로 보기까지 (초)
+def create_tracker(jenkins, settings):
+    return BuildTracker(
+        jenkins, interval=settings.jenkins_poll_interval, max_age=settings.jenkins_track_max_age,
+        lost_grace=settings.jenkins_queue_lost_grace
+    )
@@ -0,0 +1,161 @@
+from bson import ObjectId, json_util
+from collections import OrderedDict
+import asyncio
+import time
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+# 프로세스 내부 LRU + TTL 저장소
+class MemoryBackend:
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.evictions = 0
+        self._items = OrderedDict()  # key -> (만료 시각, 값)
+
+    def __len__(self):
+        return len(self._items)
+
+    async def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key, value):
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key):
+        self._items.pop(key, None)
+
+    def discard(self, key):
+        self._items.pop(key, None)
+
+# 여러 프로세스가 공유하는 redis 호환 저장소 (LRU 는 redis 의 maxmemory-policy 로 설정)
+class RedisBackend:
+    def __init__(self, url, ttl, prefix="project:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+        self._redis = redis.from_url(url)
+
+    def __len__(self):
+        return 0
+
+    async def get(self, key):
+        raw = await self._redis.get(self.prefix + key)
+        return json_util.loads(raw) if raw is not None else None
+
+    async def set(self, key, value):
+        await self._redis.set(self.prefix + key, json_util.dumps(value), ex=max(int(self.ttl), 1))
+
+    async def delete(self, key):
+        await self._redis.delete(self.prefix + key)
+
+    def discard(self, key):
+        pass
+
+    async def close(self):
+        await self._redis.aclose()
+
+# project_id 로 프로젝트 문서를 읽어 오는 read-through 캐시
+class ProjectCache:
+    def __init__(self, collection, backend):
+        self.collection = collection
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._stale = set()  # 무효화 요청 후 아직 다시 읽지 않은 키
+        # DB 를 읽고 있는 키만 [읽는 중인 요청 수, 무효화 횟수] (읽는 동안 바뀌면 읽은 문서를 캐시하지 않음)
+        # 마지막 읽기가 끝나면 지우므로 크기는 동시에 읽는 키 수를 넘지 않음
+        self._reads = {}
+        self._tasks = set()
+
+    async def get(self, project_id):
+        if not ObjectId.is_valid(project_id):
+            return None
+        if project_id not in self._stale:
+            project = await self.backend.get(project_id)
+            if project is not None:
+                self.hits += 1
+                return project
+
+        self.misses += 1
+        read = self._reads.setdefault(project_id, [0, 0])
+        read[0] += 1
+        version = read[1]
+        try:
+            project = await self.collection.find_one({"_id": ObjectId(project_id)})
+        finally:
+            read[0] -= 1
+            if not read[0] and self._reads.get(project_id) is read:
+                del self._reads[project_id]
+        # 읽는 동안 문서가 바뀌었으면 변경 전 문서일 수 있으므로 그대로 돌려주기만 함
+        if read[1] != version:
+            return project
+        self._stale.discard(project_id)
+        if project is not None:
+            await self.backend.set(project_id, project)
+        return project
+
+    def _bump(self, project_id):
+        read = self._reads.get(project_id)
+        if read is not None:
+            read[1] += 1
+
+    async def invalidate(self, project_id):
+        self.invalidations += 1
+        self._bump(project_id)
+        self.backend.discard(project_id)
+        await self.backend.delete(project_id)
+        self._stale.discard(project_id)
+
+    # hub 리스너: 젠킨스 파이프라인 등 외부에서 바뀐 문서도 무효화
+    # 이벤트 루프에서 동기로 불리므로 즉시 stale 표시 후 삭제는 태스크로 처리
+    def on_change(self, project_id, doc):
+        self._bump(project_id)
+        self._stale.add(project_id)
+        self.backend.discard(project_id)
+        task = asyncio.create_task(self.invalidate(project_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "evictions": self.backend.evictions,
+            "size": len(self.backend),
+        }
+
+    async def close(self):
+        if hasattr(self.backend, "close"):
+            await self.backend.close()
+
+# 캐시를 끄면 TTL 0 의 메모리 저장소 = 항상 DB 조회
+def create_cache(collection, settings):
+    ttl = settings.cache_ttl
+    if settings.cache_backend == "redis":
+        return ProjectCache(collection, RedisBackend(settings.cache_redis_url, ttl))
+    if settings.cache_backend == "none":
+        ttl = 0
+    return ProjectCache(collection, MemoryBackend(ttl, settings.cache_max_size))
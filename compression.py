@@ -0,0 +1,56 @@
+import gzip
+
+# minimum_size 바이트 이상인 한 덩어리 응답(JSON 등)만 gzip 으로 압축
+# 여러 덩어리로 나눠 보내는 스트리밍 응답(SSE, NDJSON)은 압축하면 버퍼링되어 늦게 도착하므로 그대로 전달
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=1024, level=5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _accepts_gzip(scope):
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = start.get("headers", [])
+            encoded = any(key.lower() == b"content-encoding" for key, _ in headers)
+            if message.get("more_body", False) or encoded or len(body) < self.minimum_size:
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = gzip.compress(body, compresslevel=self.level)
+            headers = [(key, value) for key, value in headers if key.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", b"gzip"),
+                (b"content-length", str(len(body)).encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+def _accepts_gzip(scope):
+    for key, value in scope.get("headers", []):
+        if key == b"accept-encoding":
+            return b"gzip" in value.lower()
+    return False
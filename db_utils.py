@@ -1,25 +1,408 @@
-from pymongo import MongoClient
-from os import getenv
-
-def connect_to_db():
-    user = getenv("DB_USER")
-    pwd = getenv("DB_PWD")
-    host = getenv("DB_HOST")
-    port = int(getenv("DB_PORT", 27017))
-    
-    if not all([user, pwd, host]):
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.results import InsertOneResult, UpdateResult, DeleteResult
+from bson import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key, partial
+import asyncio
+import copy
+import metrics
+import threading
+
+# MongoClient 는 만들 때 서버에 접속하지 않음 (첫 요청 때 백그라운드로 연결)
+def connect_to_db(settings):
+    # DB_BACKEND=memory 이면 서버 없이 동작하는 메모리 저장소 사용 (테스트/로컬 개발용)
+    if settings.db_backend == "memory":
+        return MemoryClient()
+
+    if not all([settings.db_user, settings.db_pwd, settings.db_host]):
         raise EnvironmentError("DB_USER, DB_PWD, and DB_HOST environment variables must be set")
-    
+
     client = MongoClient(
-        host=host,
-        port=port,
-        username=user,
-        password=pwd
+        host=settings.db_host,
+        port=settings.db_port,
+        username=settings.db_user,
+        password=settings.db_pwd,
+        # 커넥션 풀 / 타임아웃 설정
+        maxPoolSize=settings.db_max_pool_size,
+        minPoolSize=settings.db_min_pool_size,
+        maxIdleTimeMS=settings.db_max_idle_time_ms,
+        connectTimeoutMS=settings.db_connect_timeout_ms,
+        socketTimeoutMS=settings.db_socket_timeout_ms,
+        serverSelectionTimeoutMS=settings.db_server_selection_timeout_ms,
+        waitQueueTimeoutMS=settings.db_wait_queue_timeout_ms
     )
-    
+
     return client
 
 def get_collection(client, db_name, collection_name):
     db = client[db_name]
-    
+
     return db[collection_name]
+
+# 비동기 핸들러에서 사용하는 컬렉션
+# pymongo 호출을 전용 스레드 풀에서 실행해서 이벤트 루프를 막지 않음
+def create_executor(workers):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo")
+
+def get_async_collection(client, db_name, collection_name, executor):
+    return AsyncCollection(get_collection(client, db_name, collection_name), executor)
+
+class AsyncCollection:
+    def __init__(self, collection, executor):
+        self.collection = collection
+        self.executor = executor
+
+    @property
+    def name(self):
+        return self.collection.name
+
+    # op 이름별로 소요 시간 기록 (스레드 풀 대기 시간 포함)
+    async def _run(self, op, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        with metrics.timed("mongo", op):
+            return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    async def find_one(self, filter, projection=None):
+        return await self._run("find_one", self.collection.find_one, filter, projection)
+
+    async def find(self, filter=None, projection=None, sort=None, skip=0, limit=0):
+        def query():
+            cursor = self.collection.find(filter or {}, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if skip:
+                cursor = cursor.skip(skip)
+            if limit:
+                cursor = cursor.limit(limit)
+            return list(cursor)
+        return await self._run("find", query)
+
+    async def count_documents(self, filter):
+        return await self._run("count_documents", self.collection.count_documents, filter)
+
+    async def insert_one(self, document):
+        return await self._run("insert_one", self.collection.insert_one, document)
+
+    async def update_one(self, filter, update, upsert=False):
+        return await self._run("update_one", self.collection.update_one, filter, update, upsert=upsert)
+
+    async def update_many(self, filter, update):
+        return await self._run("update_many", self.collection.update_many, filter, update)
+
+    async def delete_one(self, filter):
+        return await self._run("delete_one", self.collection.delete_one, filter)
+
+    async def delete_many(self, filter):
+        return await self._run("delete_many", self.collection.delete_many, filter)
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.AFTER):
+        return await self._run(
+            "find_one_and_update", self.collection.find_one_and_update, filter, update,
+            projection=projection, upsert=upsert, return_document=return_document
+        )
+
+    async def create_index(self, keys, **kwargs):
+        return await self._run("create_index", self.collection.create_index, keys, **kwargs)
+
+    # 연결 확인 (첫 호출에서 커넥션 풀을 채움)
+    async def ping(self):
+        return await self._run("ping", self.collection.database.command, "ping")
+
+    # change stream 은 블로킹 이터레이터라 호출하는 쪽에서 스레드로 실행해야 함
+    def watch(self, **kwargs):
+        return self.collection.watch(**kwargs)
+
+
+# ---- 메모리 저장소 (pymongo 에서 사용하는 기능의 일부만 구현) ----
+
+_MISSING = object()
+
+class MemoryClient:
+    def __init__(self):
+        self._databases = {}
+
+    def __getitem__(self, name):
+        return self._databases.setdefault(name, MemoryDatabase(name))
+
+    def close(self):
+        pass
+
+class MemoryDatabase:
+    def __init__(self, name):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name):
+        return self._collections.setdefault(name, MemoryCollection(name, self))
+
+    def command(self, name):
+        return {"ok": 1.0}
+
+class MemoryCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, key, direction=None):
+        keys = key if direction is None else [(key, direction)]
+        self._docs = sorted(self._docs, key=cmp_to_key(partial(_compare_docs, keys)))
+        return self
+
+    def skip(self, count):
+        self._docs = self._docs[count:]
+        return self
+
+    def limit(self, count):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self._docs)
+
+class MemoryCollection:
+    def __init__(self, name, database=None):
+        self.name = name
+        self.database = database
+        self._docs = {}
+        self._lock = threading.Lock()
+
+    def _matching(self, filter):
+        return [doc for doc in self._docs.values() if _match(doc, filter or {})]
+
+    def find_one(self, filter=None, projection=None):
+        with self._lock:
+            docs = self._matching(filter)
+            return _project(docs[0], projection) if docs else None
+
+    def find(self, filter=None, projection=None):
+        with self._lock:
+            return MemoryCursor([_project(doc, projection) for doc in self._matching(filter)])
+
+    def count_documents(self, filter):
+        with self._lock:
+            return len(self._matching(filter))
+
+    def insert_one(self, document):
+        with self._lock:
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            if document["_id"] in self._docs:
+                raise DuplicateKeyError(f"E11000 duplicate key error: {document['_id']}")
+            self._docs[document["_id"]] = copy.deepcopy(document)
+            return InsertOneResult(document["_id"], True)
+
+    def _update(self, filter, update, upsert, many):
+        docs = self._matching(filter)
+        if not many:
+            docs = docs[:1]
+        for doc in docs:
+            _apply_update(doc, update, inserting=False)
+        upserted_id = None
+        if not docs and upsert:
+            doc = {key: value for key, value in filter.items() if not key.startswith("$") and not isinstance(value, dict)}
+            _apply_update(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            if doc["_id"] in self._docs:
+                raise DuplicateKeyError(f"E11000 duplicate key error: {doc['_id']}")
+            self._docs[doc["_id"]] = doc
+            upserted_id = doc["_id"]
+        raw = {"n": len(docs) or int(upserted_id is not None), "nModified": len(docs)}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    def update_one(self, filter, update, upsert=False):
+        with self._lock:
+            return self._update(filter, update, upsert, many=False)
+
+    def update_many(self, filter, update, upsert=False):
+        with self._lock:
+            return self._update(filter, update, upsert, many=True)
+
+    def delete_one(self, filter):
+        with self._lock:
+            docs = self._matching(filter)
+            if docs:
+                del self._docs[docs[0]["_id"]]
+            return DeleteResult({"n": len(docs[:1])}, True)
+
+    def delete_many(self, filter):
+        with self._lock:
+            docs = self._matching(filter)
+            for doc in docs:
+                del self._docs[doc["_id"]]
+            return DeleteResult({"n": len(docs)}, True)
+
+    def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE):
+        with self._lock:
+            docs = self._matching(filter)
+            before = copy.deepcopy(docs[0]) if docs else None
+            result = self._update(filter, update, upsert, many=False)
+            if return_document == ReturnDocument.BEFORE:
+                return _project(before, projection) if before else None
+            _id = before["_id"] if before else result.upserted_id
+            if _id is None:
+                return None
+            return _project(self._docs[_id], projection)
+
+    def create_index(self, keys, **kwargs):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        return "_".join(f"{key}_{direction}" for key, direction in keys)
+
+    def watch(self, **kwargs):
+        # 메모리 저장소는 change stream 을 지원하지 않음 => 호출 측은 폴링으로 전환
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+def _get(doc, path):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+def _match(doc, filter):
+    for key, condition in filter.items():
+        if key == "$or":
+            if not any(_match(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(_match(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(_match(doc, sub) for sub in condition):
+                return False
+        elif not _match_value(_get(doc, key), condition):
+            return False
+    return True
+
+def _equals(value, expected):
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+def _match_value(value, condition):
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return _equals(value, condition)
+
+    for op, arg in condition.items():
+        if op == "$eq":
+            ok = _equals(value, arg)
+        elif op == "$ne":
+            ok = not _equals(value, arg)
+        elif op == "$in":
+            ok = any(_equals(value, item) for item in arg)
+        elif op == "$nin":
+            ok = not any(_equals(value, item) for item in arg)
+        elif op == "$exists":
+            ok = (value is not _MISSING) == bool(arg)
+        elif op in ("$gt", "$gte", "$lt", "$lte"):
+            ok = value is not _MISSING and value is not None and _compare_op(op, value, arg)
+        else:
+            raise OperationFailure(f"unknown operator: {op}")
+        if not ok:
+            return False
+    return True
+
+def _compare_op(op, value, arg):
+    try:
+        if op == "$gt":
+            return value > arg
+        if op == "$gte":
+            return value >= arg
+        if op == "$lt":
+            return value < arg
+        return value <= arg
+    except TypeError:
+        return False
+
+def _sort_key(value):
+    # 몽고 정렬 순서를 단순화: 없음/None < 숫자 < 문자열 < 그 외
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (4, str(value))
+    return (3, value)
+
+def _compare_docs(keys, a, b):
+    for key, direction in keys:
+        left, right = _sort_key(_get(a, key)), _sort_key(_get(b, key))
+        if left != right:
+            try:
+                result = -1 if left < right else 1
+            except TypeError:
+                result = -1 if str(left) < str(right) else 1
+            return result * direction
+    return 0
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = copy.deepcopy(value)
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+def _apply_update(doc, update, inserting):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set":
+                _set_path(doc, path, value)
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, value)
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                current = _get(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$push":
+                current = _get(doc, path)
+                _set_path(doc, path, ([] if current is _MISSING else current) + [value])
+            else:
+                raise OperationFailure(f"unknown update operator: {op}")
+
+def _project(doc, projection):
+    if doc is None:
+        return None
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    include_id = projection.get("_id", 1)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(fields.values()):
+        result = {}
+        for path in fields:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                _set_path(result, path, value)
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+
+    for path, value in fields.items():
+        if not value:
+            _unset_path(doc, path)
+    if not include_id:
+        doc.pop("_id", None)
+    return doc
@@ -0,0 +1,113 @@
+from collections import deque
+from datetime import datetime, timezone
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 이벤트 루프 지연 / 블로킹 호출 감시 (LOOP_MONITOR_ENABLED=true 일 때만 실행)
+# - 루프에서 interval 초마다 도는 콜백이 예정보다 늦게 실행된 시간 = 루프 지연
+# - 별도 스레드가 콜백이 threshold 초 넘게 돌지 않으면 그 순간의 루프 스레드 스택을 기록
+#   (pymongo / boto3 / requests 같은 동기 호출이 어디서 루프를 막고 있는지 바로 보임)
+# asyncio 디버그 모드(slow_callback_duration)와 달리 모든 콜백을 계측하지 않아 운영에서도 켤 수 있음
+class LoopMonitor:
+    def __init__(self, interval=0.05, threshold=0.1, history=20, stack_limit=30):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._recent = deque(maxlen=history)  # 최근 멈춤 기록 (최신이 마지막)
+        self._lock = threading.Lock()
+        self._stalled = None  # 감시 스레드가 기록 중인 멈춤
+        self._due = None  # 다음 콜백 예정 시각 (time.monotonic)
+        self._handle = None
+        self._loop_thread = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._handle is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopping.clear()
+        self._due = time.monotonic() + self.interval
+        self._handle = loop.call_later(self.interval, self._tick, loop)
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        if self._handle is None:
+            return
+        self._handle.cancel()
+        self._handle = None
+        self._stopping.set()
+        await asyncio.to_thread(self._watchdog.join)
+        self._watchdog = None
+
+    def _tick(self, loop):
+        current = time.monotonic()
+        lag = max(current - self._due, 0.0)
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        metrics.loop_lag(lag)
+        with self._lock:
+            if self._stalled is not None:
+                # 멈춘 동안 기록한 스택에 실제로 막힌 시간을 채움
+                self._stalled["duration"] = round(lag, 4)
+                self._stalled = None
+            self._due = current + self.interval
+        self._handle = loop.call_later(self.interval, self._tick, loop)
+
+    def _watch(self):
+        while not self._stopping.wait(min(self.interval, self.threshold / 2)):
+            with self._lock:
+                blocked = time.monotonic() - self._due
+                if blocked < self.threshold or self._stalled is not None:
+                    continue
+                self._stalled = stall = {
+                    "at": datetime.now(timezone.utc).isoformat(),
+                    "duration": None,  # 루프가 다시 돌면 채움
+                    "stack": self._capture(),
+                }
+                self._recent.append(stall)
+                self.stalls += 1
+            metrics.loop_stall()
+            where = stall["stack"][-1].splitlines()[0].strip() if stall["stack"] else "unknown"
+            logger.warning("Event loop blocked for more than %.3fs at %s", blocked, where)
+
+    # 루프 스레드가 지금 실행 중인 위치 (가장 안쪽 stack_limit 개)
+    def _capture(self):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return []
+        return traceback.format_stack(frame, limit=self.stack_limit)
+
+    def stats(self):
+        return {"lag_seconds": self.lag, "max_lag_seconds": self.max_lag, "stalls": self.stalls}
+
+    def snapshot(self):
+        with self._lock:
+            recent = [dict(stall) for stall in reversed(self._recent)]
+        return {
+            "running": self._handle is not None,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            **self.stats(),
+            "recent_stalls": recent,
+        }
+
+def create_loop_monitor(settings):
+    if not settings.loop_monitor_enabled:
+        return None
+    return LoopMonitor(
+        interval=settings.loop_monitor_interval, threshold=settings.loop_stall_threshold,
+        history=settings.loop_stall_history
+    )
@@ -0,0 +1,159 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from collections import namedtuple
+from uploads import UploadError
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# 업로드 세션 상태
+PENDING = "pending"        # URL 발급됨, 브라우저 업로드 대기
+VERIFYING = "verifying"    # finalize 처리 중
+FINALIZED = "finalized"    # 프로젝트 반영 / 작업 등록 완료
+
+sha256_pattern = re.compile(r"^[0-9a-f]{64}$")
+
+class SessionNotFound(Exception):
+    pass
+
+# 같은 세션의 finalize 가 다른 요청에서 처리 중
+class SessionBusy(Exception):
+    def __init__(self, retry_after=1):
+        super().__init__("This upload is already being finalized")
+        self.retry_after = retry_after
+
+# 확인이 끝난 파일 (S3StreamWriter 와 같은 key / digest / filename)
+UploadedFile = namedtuple("UploadedFile", ["key", "digest", "filename"])
+
+def upload_key(project_id, upload_id, name):
+    return f"projects/{project_id}/{upload_id}/{name}"
+
+def uploaded_files(session):
+    return {
+        name: UploadedFile(file["key"], file["digest"], file["filename"])
+        for name, file in session["files"].items()
+    }
+
+# 브라우저가 S3 로 직접 올리는 2단계 업로드
+# 1) begin: 파일마다 projects/{project_id}/ 아래 presigned PUT URL 발급 (크기 / sha256 을 미리 받음)
+# 2) finalize: HEAD 로 크기 / ETag 를 확인한 뒤 호출 측이 프로젝트 반영과 젠킨스 작업을 진행
+# 세션 문서는 expires_at TTL 인덱스로 정리, finalize 는 여러 번 호출해도 같은 작업을 돌려줌
+class UploadSessions:
+    def __init__(self, collection, storage, expires=900, ttl=3600, max_size=64 * 1024 * 1024, lock_timeout=60):
+        self.collection = collection
+        self.storage = storage
+        self.expires = expires
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock_timeout = lock_timeout
+
+    async def create_indexes(self):
+        await self.collection.create_index([("expires_at", 1)], expireAfterSeconds=0)
+
+    # files: {필드명: {"filename", "size", "sha256"(hex)}}
+    async def begin(self, job_type, project_id, files, required, project_name=None):
+        if set(files) != set(required):
+            raise UploadError(f"Expected files: {', '.join(sorted(required))}")
+        for name, spec in files.items():
+            if not 0 < spec["size"] <= self.max_size:
+                raise UploadError(f"{name} must be between 1 and {self.max_size} bytes")
+            if not sha256_pattern.match(spec["sha256"]):
+                raise UploadError(f"{name} sha256 must be 64 lowercase hex characters")
+
+        upload_id = ObjectId()
+        now = datetime.now(timezone.utc)
+        session = {
+            "_id": upload_id,
+            "type": job_type,
+            "project_id": project_id,
+            "project_name": project_name,
+            "state": PENDING,
+            "files": {
+                name: {
+                    "key": upload_key(project_id, upload_id, name),
+                    "filename": spec.get("filename") or name,
+                    "size": spec["size"],
+                    "digest": f"sha256:{spec['sha256']}",
+                }
+                for name, spec in files.items()
+            },
+            "job_id": None,
+            "created_at": now,
+            "upload_expires_at": now + timedelta(seconds=self.expires),
+            "expires_at": now + timedelta(seconds=self.ttl),
+        }
+        urls = {}
+        for name, spec in files.items():
+            key = session["files"][name]["key"]
+            presigned = await self.storage.presign_put(key, self.expires, bytes.fromhex(spec["sha256"]))
+            urls[name] = {"method": "PUT", "key": key, **presigned}
+        await self.collection.insert_one(session)
+        return {
+            "upload_id": str(upload_id),
+            "project_id": project_id,
+            "expires_at": session["upload_expires_at"].isoformat(),
+            "files": urls,
+        }
+
+    # 세션을 선점하고 업로드된 객체를 확인
+    # 이미 끝난 세션이면 그대로 돌려주고(job_id 있음), 확인에 실패하면 다시 finalize 할 수 있도록 되돌림
+    # etags: 브라우저가 PUT 응답으로 받은 ETag (주면 HEAD 의 ETag 와 비교)
+    async def claim(self, upload_id, etags=None):
+        if not ObjectId.is_valid(upload_id):
+            raise SessionNotFound("Upload not found")
+        now = datetime.now(timezone.utc)
+        session = await self.collection.find_one_and_update(
+            {"_id": ObjectId(upload_id), "expires_at": {"$gt": now}, "$or": [
+                {"state": PENDING},
+                {"state": VERIFYING, "locked_until": {"$lt": now}}
+            ]},
+            {"$set": {"state": VERIFYING, "locked_until": now + timedelta(seconds=self.lock_timeout)}}
+        )
+        if session is None:
+            session = await self.collection.find_one({"_id": ObjectId(upload_id)})
+            if session is None:
+                raise SessionNotFound("Upload not found")
+            if session["state"] == FINALIZED:
+                return session
+            if session["state"] == PENDING:
+                # 대기 중인데 선점하지 못했으면 만료된 세션
+                raise SessionNotFound("Upload expired")
+            raise SessionBusy()
+
+        try:
+            await self._verify(session, etags or {})
+        except BaseException:
+            await self.release(session)
+            raise
+        return session
+
+    async def _verify(self, session, etags):
+        problems = []
+        for name, file in session["files"].items():
+            head = await self.storage.head(file["key"])
+            if head is None:
+                problems.append(f"{name} was not uploaded")
+            elif head["size"] != file["size"]:
+                problems.append(f"{name} is {head['size']} bytes, expected {file['size']}")
+            elif name in etags and head["etag"].strip('"') != etags[name].strip('"'):
+                problems.append(f"{name} ETag does not match the uploaded object")
+        if problems:
+            raise UploadError("; ".join(problems))
+
+    async def complete(self, session, job_id):
+        await self.collection.update_one(
+            {"_id": session["_id"]}, {"$set": {"state": FINALIZED, "job_id": job_id}}
+        )
+
+    # 작업 등록 전에 실패하면 다시 finalize 할 수 있도록 되돌림
+    async def release(self, session):
+        await self.collection.update_one(
+            {"_id": session["_id"], "state": VERIFYING}, {"$set": {"state": PENDING}}
+        )
+
+def create_upload_sessions(collection, storage, settings):
+    return UploadSessions(
+        collection, storage, expires=settings.presign_expires, ttl=settings.upload_session_ttl,
+        max_size=settings.upload_max_size, lock_timeout=settings.upload_lock_timeout
+    )
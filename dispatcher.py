@@ -0,0 +1,210 @@
+from collections import deque
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+UPDATE = "UPDATE"
+
+# 대기열이 가득 차서 받을 수 없음 => 429 + Retry-After
+class Busy(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many pending Jenkins builds, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+# 젠킨스 빌드 한 번에 해당하는 작업 묶음 (대기 중인 UPDATE 는 하나로 합쳐짐)
+class Entry:
+    def __init__(self, job_type, project_id, job_ids, timeout, trace=None):
+        self.job_type = job_type
+        self.project_id = project_id
+        self.job_ids = list(job_ids)
+        self.timeout = timeout
+        self.trace = trace  # 첫 작업의 trace 문맥 (합쳐진 빌드는 첫 요청의 trace 에 이어짐)
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+
+# 프로젝트별로 빌드를 하나씩 순서대로 실행하고, 동시에 진행 중인 전체 빌드 수를 제한
+# 빌드는 trigger(entry) 가 성공하면 시작되고, 젠킨스 빌드 결과가 나올 때(release) 끝남
+# 큐 항목(Location 헤더)이 없어 빌드를 추적할 수 없으면 작업 감시자의 완료 판정으로 끝남
+class Dispatcher:
+    def __init__(self, trigger, max_inflight=10, max_queue=100, retry_after=5):
+        self.trigger = trigger
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.retry_after_default = retry_after
+        self._queues = {}  # project_id -> deque[Entry] (삽입 순서 = 실행 순서)
+        self._active = {}  # project_id -> 진행 중인 Entry
+        self._job_ids = set()  # 대기 중이거나 진행 중인 작업 (같은 작업을 두 번 받지 않도록)
+        self._tasks = set()
+        self.paused = False  # 종료 중에는 새 빌드를 시작하지 않음 (대기 작업은 작업 문서로 남음)
+        # 통계
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._hold_avg = None  # 빌드 한 건이 슬롯을 점유하는 평균 시간 (지수 이동 평균)
+
+    def queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def in_flight(self):
+        return len(self._active)
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        self._pump()
+
+    # 리더에서 물러날 때 대기열을 비움 (작업은 작업 문서로 남아 새 리더가 복구)
+    def clear(self):
+        self._queues.clear()
+        self._active.clear()
+        self._job_ids.clear()
+
+    def retry_after(self):
+        if self._hold_avg is None:
+            return self.retry_after_default
+        rounds = (self.queued() + 1) / self.max_inflight
+        return max(1, math.ceil(self._hold_avg * rounds))
+
+    # 새 작업을 받을 수 있는지 미리 확인 (파일 업로드 전에 거절하기 위함)
+    # 확인 후 업로드 중인 요청은 그대로 받으므로 max_queue 는 약간 넘을 수 있음
+    def check_capacity(self):
+        if self.queued() >= self.max_queue:
+            self.rejected += 1
+            raise Busy(self.retry_after())
+
+    def submit(self, job_type, project_id, job_id, timeout, trace=None):
+        if job_id in self._job_ids:
+            return
+        self._job_ids.add(job_id)
+        queue = self._queues.get(project_id)
+        # 아직 시작하지 않은 UPDATE 가 있으면 합쳐서 빌드 한 번으로 처리
+        if job_type == UPDATE and queue and queue[-1].job_type == UPDATE:
+            queue[-1].job_ids.append(job_id)
+            self.submitted += 1
+            self.coalesced += 1
+            return
+        self._enqueue(Entry(job_type, project_id, [job_id], timeout, trace))
+        self.submitted += 1
+
+    def _enqueue(self, entry):
+        self._queues.setdefault(entry.project_id, deque()).append(entry)
+        self._pump()
+
+    # 재시작 / 리더 선출 시 복구: 이미 트리거된 작업은 진행 중으로, 대기 중이던 작업은 다시 대기열로
+    # 다른 레플리카가 만든 작업을 주기적으로 받아올 때도 사용 (이미 받은 작업은 건너뜀)
+    def restore(self, triggered_jobs, queued_jobs, timeout_of):
+        for job in triggered_jobs:
+            if str(job["_id"]) in self._job_ids:
+                continue
+            self._job_ids.add(str(job["_id"]))
+            active = self._active.get(job["project_id"])
+            if active is not None:
+                active.job_ids.append(str(job["_id"]))
+                continue
+            entry = Entry(job["type"], job["project_id"], [str(job["_id"])], timeout_of(job), job.get("traceparent"))
+            entry.started_at = time.monotonic()
+            self._active[job["project_id"]] = entry
+        for job in queued_jobs:
+            if str(job["_id"]) in self._job_ids:
+                continue
+            self._job_ids.add(str(job["_id"]))
+            queue = self._queues.get(job["project_id"])
+            if job["type"] == UPDATE and queue and queue[-1].job_type == UPDATE:
+                queue[-1].job_ids.append(str(job["_id"]))
+            else:
+                self._queues.setdefault(job["project_id"], deque()).append(
+                    Entry(job["type"], job["project_id"], [str(job["_id"])], timeout_of(job), job.get("traceparent"))
+                )
+        self._pump()
+
+    # 빈 슬롯이 있으면 진행 중인 빌드가 없는 프로젝트 중 가장 오래 기다린 작업부터 시작
+    def _pump(self):
+        if self.paused:
+            return
+        waiting = sorted(self._queues.items(), key=lambda item: item[1][0].enqueued_at)
+        for project_id, queue in waiting:
+            if len(self._active) >= self.max_inflight:
+                break
+            if project_id in self._active:
+                continue
+            entry = queue.popleft()
+            if not queue:
+                del self._queues[project_id]
+
+            entry.started_at = time.monotonic()
+            waited = entry.started_at - entry.enqueued_at
+            self.wait_count += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+            self._active[project_id] = entry
+            task = asyncio.create_task(self._run(entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, entry):
+        try:
+            started = await self.trigger(entry)
+        except Exception as e:
+            logger.exception("Dispatcher error: %s", e)
+            started = False
+        if not started:
+            self.release(entry.project_id)
+
+    # 작업 감시자 리스너: 추적하지 않는 빌드의 작업이 끝나면 다음 작업 시작
+    # 프로젝트 문서(end_point 등)나 작업 타임아웃으로 먼저 끝난 작업은 젠킨스 빌드가 아직 돌고 있을 수 있음
+    def on_job_finished(self, job, status, error):
+        if job.get("queue_url") and job.get("build_result") is None:
+            return
+        entry = self._active.get(job["project_id"])
+        if entry is not None and str(job["_id"]) in entry.job_ids:
+            self.release(job["project_id"])
+
+    # BuildTracker 리스너: 빌드 결과가 나오거나 추적이 만료되면 다음 작업 시작
+    def on_build(self, build):
+        if build.result is None:
+            return
+        for project_id, entry in list(self._active.items()):
+            if build.job_ids.intersection(entry.job_ids):
+                self.release(project_id)
+
+    def release(self, project_id):
+        entry = self._active.pop(project_id, None)
+        if entry is None:
+            return
+        self._job_ids.difference_update(entry.job_ids)
+        held = time.monotonic() - entry.started_at
+        self._hold_avg = held if self._hold_avg is None else 0.8 * self._hold_avg + 0.2 * held
+        self._pump()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._active),
+            "max_in_flight": self.max_inflight,
+            "queued": self.queued(),
+            "max_queue": self.max_queue,
+            "projects_waiting": len(self._queues),
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "wait_seconds_avg": self.wait_total / self.wait_count if self.wait_count else 0.0,
+            "wait_seconds_max": self.wait_max,
+            "build_seconds_avg": self._hold_avg or 0.0,
+        }
+
+# JENKINS_MAX_INFLIGHT: 동시에 진행하는 젠킨스 빌드 수 / DISPATCH_MAX_QUEUE: 대기할 수 있는 빌드 수
+def create_dispatcher(trigger, settings):
+    return Dispatcher(
+        trigger,
+        max_inflight=settings.jenkins_max_inflight,
+        max_queue=settings.dispatch_max_queue,
+        retry_after=settings.dispatch_retry_after
+    )
@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+import itertools
+import logging
+import jobs
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 프로젝트 문서 변화에서 읽어 내는 상태 전이
+ENDPOINT_ASSIGNED = "endpoint_assigned"
+META_DATA_POPULATED = "meta_data_populated"
+REVISION_BUMPED = "revision_bumped"
+DELETED = "deleted"
+
+# meta_data 필수 항목
+required_keys = {"helm_name", "last_deployed", "namespace", "status", "revision", "chart", "app_version"}
+
+def meta_data_ready(doc):
+    meta_data = (doc or {}).get("meta_data") or {}
+    return required_keys.issubset(meta_data.keys())
+
+def _revision(doc):
+    return ((doc or {}).get("meta_data") or {}).get("revision")
+
+def transitions(before, after):
+    if after is None:
+        return [(DELETED, {})] if before is not None else []
+    before = before or {}
+    events = []
+    if before.get("end_point", "NULL") == "NULL" and after.get("end_point", "NULL") != "NULL":
+        events.append((ENDPOINT_ASSIGNED, {"end_point": after["end_point"]}))
+    if not meta_data_ready(before) and meta_data_ready(after):
+        events.append((META_DATA_POPULATED, {"meta_data": after["meta_data"]}))
+    elif meta_data_ready(before) and meta_data_ready(after):
+        old, new = _revision(before), _revision(after)
+        if old is not None and new is not None and new > old:
+            events.append((REVISION_BUMPED, {"revision": new, "meta_data": after["meta_data"]}))
+    return events
+
+# 프로젝트 하나를 보는 모든 클라이언트가 공유하는 채널 (hub 구독은 채널당 하나)
+class _Channel:
+    def __init__(self, project_id, queue_size):
+        self.project_id = project_id
+        self.queue_size = queue_size
+        self.queues = set()
+        self.last = None
+        self.ready = asyncio.Event()  # 첫 조회 완료 여부
+        self.unsubscribe = None
+        self._ids = itertools.count(1)
+
+    def send(self, event, data):
+        message = (next(self._ids), event, data)
+        for queue in self.queues:
+            if queue.full():
+                # 느린 클라이언트는 오래된 이벤트부터 버림
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    def on_change(self, doc):
+        for event, data in transitions(self.last, doc):
+            self.send(event, data)
+        self.last = doc
+
+class EventBroadcaster:
+    def __init__(self, hub, queue_size=100):
+        self.hub = hub
+        self.queue_size = queue_size
+        self._channels = {}
+
+    # 작업 상태 변화 등 문서 밖의 이벤트 (보는 클라이언트가 있을 때만 전달)
+    def publish(self, project_id, event, data):
+        channel = self._channels.get(project_id)
+        if channel is not None:
+            channel.send(event, data)
+
+    # (이벤트 번호, 이벤트 이름, 데이터) 를 차례로 돌려줌, 첫 이벤트는 현재 상태(snapshot)
+    # keepalive 초 동안 이벤트가 없으면 None 을 돌려줌
+    async def subscribe(self, project_id, keepalive=None):
+        channel = self._channels.get(project_id)
+        if channel is None:
+            channel = _Channel(project_id, self.queue_size)
+            self._channels[project_id] = channel
+            # 구독을 먼저 걸고 현재 문서를 읽어야 사이의 변경을 놓치지 않음
+            channel.unsubscribe = self.hub.subscribe(project_id, channel.on_change)
+            try:
+                channel.last = await self.hub.fetch(project_id)
+            except BaseException:
+                self._release(channel)
+                raise
+            finally:
+                channel.ready.set()
+        else:
+            await channel.ready.wait()
+
+        queue = asyncio.Queue(self.queue_size)
+        channel.queues.add(queue)
+        try:
+            yield (0, "snapshot", {"project": channel.last})
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield message
+                if message[1] == DELETED:
+                    return
+        finally:
+            channel.queues.discard(queue)
+            if not channel.queues:
+                self._release(channel)
+
+    def _release(self, channel):
+        if self._channels.get(channel.project_id) is channel and not channel.queues:
+            del self._channels[channel.project_id]
+            channel.unsubscribe()
+
+    def watchers(self):
+        return {project_id: len(channel.queues) for project_id, channel in self._channels.items()}
+
+# 작업 상태 이벤트 (작업 문서의 status 별 이벤트 이름)
+job_events = {
+    jobs.QUEUED: "job_queued",
+    jobs.TRIGGERED: "jenkins_triggered",
+    jobs.SUCCEEDED: "job_succeeded",
+    jobs.FAILED: "job_failed",
+    jobs.TIMEOUT: "job_timeout",
+}
+
+# 모든 레플리카가 공유하는 작업 문서에서 작업 이벤트를 읽어 보는 클라이언트에게 전달
+# 작업을 처리하는 리더가 아니어도 같은 이벤트를 받도록 리더의 메모리 상태가 아니라 작업 컬렉션을 폴링
+# 현재 상태가 아니라 상태 기록(history)을 모두 보내므로 조회 사이에 지나간 queued / triggered 도 전달
+# 스트림을 보는 프로젝트가 있을 때만 (project_id, updated_at) 인덱스로 조회하고,
+# 레플리카 간 시계 차이로 늦게 기록된 변경을 놓치지 않도록 overlap 초만큼 겹쳐 읽고 (작업, 상태) 로 중복 제거
+class JobEventFeed:
+    def __init__(self, jobs_collection, broadcaster, interval=1, overlap=5):
+        self.jobs = jobs_collection
+        self.broadcaster = broadcaster
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap)
+        self._since = None
+        self._joined = {}  # project_id -> 보기 시작한 시각 (그 전의 변경은 보내지 않음)
+        self._seen = {}  # (job_id, status) -> 본 시각
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning("Job event poll error: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def poll(self):
+        current = datetime.now(timezone.utc)
+        since, self._since = self._since, current
+        watched = [project_id for project_id, count in self.broadcaster.watchers().items() if count]
+        # 새로 보기 시작한 프로젝트는 직전 조회 이후의 변경부터 (구독 직후 들어온 작업을 놓치지 않도록)
+        self._joined = {project_id: self._joined.get(project_id, since or current) for project_id in watched}
+        if not watched or since is None:
+            return
+
+        metrics.poll("job_events")
+        window = since - self.overlap
+        docs = await self.jobs.find(
+            {"project_id": {"$in": watched}, "updated_at": {"$gte": window}},
+            {"project_id": 1, "type": 1, "status": 1, "error": 1, "updated_at": 1, "history": 1},
+            sort=[("updated_at", 1)]
+        )
+        for doc in docs:
+            joined = self._joined.get(doc["project_id"], current)
+            # history 가 없는 이전 작업 문서는 현재 상태만
+            history = doc.get("history") or [
+                {"status": doc["status"], "error": doc.get("error"), "at": doc["updated_at"]}
+            ]
+            for entry in history:
+                key = (str(doc["_id"]), entry["status"])
+                at = _utc(entry["at"])
+                # 읽는 구간 이전의 기록은 이미 보냈거나 보기 전의 기록
+                if key in self._seen or at < window or at < joined:
+                    continue
+                self._seen[key] = current
+                event = job_events.get(entry["status"])
+                if event is None:
+                    continue
+                data = {"job_id": key[0], "type": doc["type"]}
+                if entry["status"] in jobs.FINISHED:
+                    data["error"] = entry.get("error")
+                self.broadcaster.publish(doc["project_id"], event, data)
+
+        # 겹쳐 읽는 구간을 지난 기록은 정리
+        expired = window - self.overlap
+        self._seen = {key: seen for key, seen in self._seen.items() if seen >= expired}
+
+# SSE_JOB_INTERVAL: 작업 이벤트 조회 주기 (초)
+def create_job_feed(jobs_collection, broadcaster, settings):
+    return JobEventFeed(jobs_collection, broadcaster, interval=settings.sse_job_interval)
+
+# pymongo 는 tz 정보 없는 UTC 로 돌려줌
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
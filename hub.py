@@ -0,0 +1,171 @@
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+import asyncio
+import logging
+import metrics
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# 프로세스 전체에서 하나만 사용하는 프로젝트 변경 감시자
+# change stream 을 쓸 수 있으면 사용하고, 안 되면 대기 중인 ID 전체를 한 번의 $in 쿼리로 폴링
+class ProjectHub:
+    def __init__(self, collection, interval=2, change_stream=True, cache=None):
+        self.collection = collection
+        self.cache = cache
+        self.interval = interval
+        self.change_stream = change_stream
+        self.mode = None
+        self._subscribers = {}  # project_id -> 콜백 집합
+        self._listeners = []  # 감지한 모든 변경을 받는 콜백 (project_id, doc)
+        self._last = {}  # 폴링 모드에서 마지막으로 본 문서
+        self._task = None
+        self._stopping = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # 콜백은 변경된 문서(삭제되었으면 None)를 인자로 이벤트 루프에서 호출됨
+    def subscribe(self, project_id, callback):
+        self._subscribers.setdefault(project_id, set()).add(callback)
+
+        def unsubscribe():
+            callbacks = self._subscribers.get(project_id)
+            if callbacks is None:
+                return
+            callbacks.discard(callback)
+            if not callbacks:
+                del self._subscribers[project_id]
+                self._last.pop(project_id, None)
+
+        return unsubscribe
+
+    # 구독 여부와 관계없이 감지한 모든 변경을 받음 (캐시 무효화 등)
+    # 폴링 모드에서는 구독 중인 프로젝트의 변경만 감지됨
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    async def fetch(self, project_id):
+        if not ObjectId.is_valid(project_id):
+            return None
+        if self.cache is not None:
+            return await self.cache.get(project_id)
+        return await self.collection.find_one({"_id": ObjectId(project_id)})
+
+    # predicate 를 만족하는 문서가 나올 때까지 대기, 시간 초과 시 asyncio.TimeoutError
+    async def wait_for(self, project_id, predicate, timeout):
+        future = asyncio.get_running_loop().create_future()
+
+        def on_change(doc):
+            if not future.done() and predicate(doc):
+                future.set_result(doc)
+
+        # 구독을 먼저 걸어야 조회와 구독 사이의 변경을 놓치지 않음
+        unsubscribe = self.subscribe(project_id, on_change)
+        try:
+            on_change(await self.fetch(project_id))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            unsubscribe()
+
+    def _notify(self, project_id, doc):
+        for listener in self._listeners:
+            try:
+                listener(project_id, doc)
+            except Exception as e:
+                logger.exception("Hub listener error: %s", e)
+
+    def _dispatch(self, project_id, doc):
+        for callback in list(self._subscribers.get(project_id, ())):
+            try:
+                callback(doc)
+            except Exception as e:
+                logger.exception("Hub callback error: %s", e)
+
+    async def _run(self):
+        if self.change_stream:
+            try:
+                self.mode = "change_stream"
+                await asyncio.to_thread(self._consume, asyncio.get_running_loop())
+                return
+            except OperationFailure as e:
+                # standalone mongod 등 change stream 미지원 환경
+                logger.warning("Change streams unavailable, falling back to polling: %s", e)
+
+        self.mode = "poll"
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning("Hub poll error: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def poll(self, force=False):
+        metrics.poll("hub")
+        ids = [project_id for project_id in self._subscribers if ObjectId.is_valid(project_id)]
+        if not ids:
+            return
+
+        docs = {
+            str(doc["_id"]): doc
+            for doc in await self.collection.find({"_id": {"$in": [ObjectId(project_id) for project_id in ids]}})
+        }
+        for project_id in ids:
+            doc = docs.get(project_id)
+            if not force and project_id in self._last and self._last[project_id] == doc:
+                continue
+            self._last[project_id] = doc
+            self._notify(project_id, doc)
+            self._dispatch(project_id, doc)
+
+    # 별도 스레드에서 change stream 을 읽고 이벤트 루프로 전달
+    def _consume(self, loop):
+        resume_token = None
+        reconnect = False
+        while not self._stopping:
+            try:
+                with self.collection.watch(
+                    full_document="updateLookup",
+                    resume_after=resume_token,
+                    max_await_time_ms=1000
+                ) as stream:
+                    if reconnect:
+                        # 끊겨 있던 동안의 변경을 한 번에 다시 읽어 반영
+                        asyncio.run_coroutine_threadsafe(self.poll(force=True), loop)
+                    while not self._stopping:
+                        change = stream.try_next()
+                        if change is not None:
+                            loop.call_soon_threadsafe(self._on_change, change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                if resume_token is None and not reconnect:
+                    raise
+                logger.warning("Change stream error, restarting: %s", e)
+                resume_token = None
+                reconnect = True
+            except PyMongoError as e:
+                logger.warning("Change stream error, reconnecting: %s", e)
+                reconnect = True
+                time.sleep(self.interval)
+
+    def _on_change(self, change):
+        if "documentKey" not in change:
+            return
+        project_id = str(change["documentKey"]["_id"])
+        doc = None if change["operationType"] == "delete" else change.get("fullDocument")
+        self._notify(project_id, doc)
+        if project_id in self._subscribers:
+            self._dispatch(project_id, doc)
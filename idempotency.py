@@ -0,0 +1,181 @@
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# 기록 상태
+PROCESSING = "processing"  # 첫 요청이 처리 중
+COMPLETED = "completed"    # 응답 저장됨 (같은 키로 재시도하면 그대로 돌려줌)
+
+max_key_length = 255
+
+class IdempotencyError(Exception):
+    pass
+
+class InvalidKey(IdempotencyError):
+    pass
+
+# 같은 키의 다른 엔드포인트 / 다른 내용의 요청 => 422
+class KeyReused(IdempotencyError):
+    pass
+
+# 같은 키의 첫 요청이 아직 처리 중
+class InProgress(IdempotencyError):
+    def __init__(self, retry_after):
+        super().__init__("A request with this Idempotency-Key is still being processed")
+        self.retry_after = retry_after
+
+class Claim:
+    def __init__(self, scope, replay=None, fingerprint=None):
+        self.scope = scope
+        self.replay = replay  # 저장된 응답 {"status_code", "body"}, 처음 처리하는 요청이면 None
+        self.response = None
+        self.fingerprint = None
+        self._stored = fingerprint  # 첫 요청의 내용 요약 (이 기록이 생기기 전의 응답은 None)
+
+    # 요청 내용(이름, 업로드한 파일 digest 등)을 기록, 재시도면 첫 요청과 같은지 확인
+    # 업로드를 받은 뒤에야 알 수 있으므로 선점이 아니라 본문을 읽은 뒤 호출
+    def verify(self, **parts):
+        self.fingerprint = request_fingerprint(self.scope, **parts)
+        if self.replay is not None and self._stored is not None and self._stored != self.fingerprint:
+            raise KeyReused("Idempotency-Key was already used for a request with different content")
+
+    def complete(self, status_code, body):
+        self.response = {"status_code": status_code, "body": body}
+
+# 메소드 + 경로와 요청 내용의 sha256
+def request_fingerprint(scope, **parts):
+    raw = json.dumps({"scope": scope, **parts}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+# Idempotency-Key 별 요청 범위(메소드 + 경로), 요청 내용 요약(fingerprint)과 응답 저장소
+# 키를 먼저 선점한 요청만 업로드 / 젠킨스 작업을 진행하고, 재시도는 저장된 응답을 바로 돌려받음
+# expires_at TTL 인덱스로 ttl 초 뒤 삭제, 처리 중 멈춘 기록은 lock_timeout 초 뒤 다른 요청이 이어받음
+class IdempotencyStore:
+    def __init__(self, collection, ttl=86400, lock_timeout=60, retry_after=1):
+        self.collection = collection
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.retry_after = retry_after
+        self.replayed = 0
+        self._tasks = set()  # 응답 저장 재시도
+
+    async def create_indexes(self):
+        await self.collection.create_index([("expires_at", 1)], expireAfterSeconds=0)
+
+    # 키가 없으면 아무것도 하지 않음
+    # 처리 중 예외가 나면 기록을 지워 다음 재시도가 처음부터 처리하도록 함
+    @asynccontextmanager
+    async def claim(self, key, scope):
+        if not key:
+            yield Claim(scope)
+            return
+        if len(key) > max_key_length:
+            raise InvalidKey(f"Idempotency-Key must be at most {max_key_length} characters")
+
+        record = await self._begin(key, scope)
+        if record is not None:
+            claim = Claim(scope, record["response"], record.get("fingerprint"))
+            yield claim
+            self.replayed += 1
+            return
+
+        claim = Claim(scope)
+        try:
+            yield claim
+        except BaseException:
+            await self._release(key)
+            raise
+        if claim.response is None:
+            await self._release(key)
+            return
+        # 프로젝트 / 작업은 이미 만들어졌으므로 응답 저장에 실패해도 요청은 성공으로 돌려주고 저장만 다시 시도
+        try:
+            await self._complete(key, claim.response, claim.fingerprint)
+        except Exception as e:
+            logger.warning("Could not save response for Idempotency-Key %s, retrying: %s", key, e)
+            task = asyncio.create_task(self._retry_complete(key, claim.response, claim.fingerprint))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _complete(self, key, response, fingerprint):
+        await self.collection.update_one(
+            {"_id": key, "state": PROCESSING},
+            {"$set": {"state": COMPLETED, "response": response, "fingerprint": fingerprint}}
+        )
+
+    # lock_timeout 이 지나면 재시도 요청이 기록을 이어받아 처음부터 다시 처리하므로 그 전까지만 시도
+    async def _retry_complete(self, key, response, fingerprint):
+        delay = 0.5
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() + delay < deadline:
+            await asyncio.sleep(delay)
+            try:
+                await self._complete(key, response, fingerprint)
+                return
+            except Exception as e:
+                logger.warning("Retrying response save for Idempotency-Key %s: %s", key, e)
+            delay = min(delay * 2, 10)
+        logger.error("Gave up saving response for Idempotency-Key %s", key)
+
+    # 종료 시 남은 재시도는 취소 (기록은 lock_timeout 뒤 다른 요청이 이어받음)
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _begin(self, key, scope):
+        for _ in range(2):
+            now = datetime.now(timezone.utc)
+            fresh = {
+                "scope": scope,
+                "state": PROCESSING,
+                "created_at": now,
+                "locked_until": now + timedelta(seconds=self.lock_timeout),
+                "expires_at": now + timedelta(seconds=self.ttl),
+            }
+            try:
+                await self.collection.insert_one({"_id": key, **fresh})
+                return None
+            except DuplicateKeyError:
+                pass
+
+            # TTL 삭제 전 만료된 기록이나 처리 중 멈춘 기록은 이어받음
+            taken = await self.collection.find_one_and_update(
+                {"_id": key, "$or": [
+                    {"expires_at": {"$lt": now}},
+                    {"scope": scope, "state": PROCESSING, "locked_until": {"$lt": now}}
+                ]},
+                {"$set": fresh}
+            )
+            if taken is not None:
+                return None
+
+            record = await self.collection.find_one({"_id": key})
+            if record is None:
+                # 선점한 요청이 실패해서 지운 직후 => 다시 선점 시도
+                continue
+            if record["scope"] != scope:
+                raise KeyReused("Idempotency-Key was already used for a different request")
+            if record["state"] == PROCESSING:
+                raise InProgress(self.retry_after)
+            return record
+        raise InProgress(self.retry_after)
+
+    async def _release(self, key):
+        try:
+            await self.collection.delete_one({"_id": key, "state": PROCESSING})
+        except Exception as e:
+            logger.warning("Could not release Idempotency-Key %s: %s", key, e)
+
+    def stats(self):
+        return {"replayed": self.replayed}
+
+def create_idempotency_store(collection, settings):
+    return IdempotencyStore(collection, ttl=settings.idempotency_ttl, lock_timeout=settings.idempotency_lock_timeout)
@@ -0,0 +1,136 @@
+import asyncio
+import random
+import httpx
+import metrics
+
+class JenkinsError(Exception):
+    pass
+
+# 재시도해도 빌드가 중복되지 않는 경우만 재시도
+# (연결 자체가 안 된 경우, 젠킨스가 요청을 받지 못했다고 응답한 경우)
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+RETRY_STATUS = {502, 503, 504}
+
+# 모든 핸들러가 공유하는 젠킨스 클라이언트
+# keep-alive 커넥션 풀, 동시 요청 수 제한, 타임아웃, 지터 백오프 재시도, CSRF crumb 캐시
+class JenkinsClient:
+    def __init__(self, base_url, job, user, token, timeout=10, max_connections=20,
+                 max_concurrency=10, retries=3, backoff=0.5, transport=None):
+        self.base_url = base_url.rstrip("/")
+        self.build_url = f"{self.base_url}/job/{job}/buildWithParameters"
+        self.auth = (user, token) if token else None  # 토큰이 없으면 인증 없이 (젠킨스 대역)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = None
+        self._crumb = None  # None: 아직 조회 안 함, {}: crumb 미사용 서버
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                auth=self.auth,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                transport=self.transport
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _crumb_headers(self):
+        if self._crumb is None:
+            response = await self.client.get(f"{self.base_url}/crumbIssuer/api/json")
+            if response.status_code == 404:
+                # CSRF 보호가 꺼져 있으면 crumbIssuer 가 404
+                self._crumb = {}
+            elif response.status_code == 200:
+                try:
+                    data = response.json()
+                    self._crumb = {data["crumbRequestField"]: data["crumb"]}
+                except (ValueError, KeyError, TypeError):
+                    return {}
+            else:
+                # 재시작 중 등 일시적인 오류는 기록하지 않고 다음 요청에서 다시 받음
+                return {}
+        return self._crumb
+
+    def _delay(self, attempt):
+        # full jitter: 0 ~ backoff * 2^attempt
+        return random.uniform(0, self.backoff * (2 ** attempt))
+
+    async def trigger(self, parameters):
+        with metrics.timed("jenkins", "build_with_parameters"):
+            return await self._trigger(parameters)
+
+    async def _trigger(self, parameters):
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                last = attempt == self.retries
+                try:
+                    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+                    headers.update(await self._crumb_headers())
+                    response = await self.client.post(self.build_url, data=parameters, headers=headers)
+                except RETRY_EXCEPTIONS as e:
+                    if last:
+                        raise JenkinsError(f"Jenkins unreachable: {e}")
+                except httpx.HTTPError as e:
+                    raise JenkinsError(f"Jenkins request failed: {e}")
+                else:
+                    if response.status_code == 403 and self._crumb != {} and not last:
+                        # crumb 만료 / 아직 못 받음 => 다시 받아서 재시도
+                        self._crumb = None
+                    elif response.status_code not in RETRY_STATUS or last:
+                        return response
+                await asyncio.sleep(self._delay(attempt))
+        raise JenkinsError("Jenkins rejected the request")
+
+    # 서버 응답 확인 (첫 호출에서 커넥션 풀을 만들고 crumb 을 받아 둠)
+    async def ping(self):
+        await self.api_json(self.base_url, tree="mode")
+        async with self._semaphore:
+            try:
+                await self._crumb_headers()
+            except httpx.HTTPError as e:
+                raise JenkinsError(f"Jenkins request failed: {e}")
+
+    # 큐 항목 / 빌드 정보 조회 (url 은 Location 헤더나 executable.url), 없으면 None
+    async def api_json(self, url, tree=None):
+        params = {"tree": tree} if tree else None
+        async with self._semaphore:
+            try:
+                with metrics.timed("jenkins", "api_json"):
+                    response = await self.client.get(f"{url.rstrip('/')}/api/json", params=params)
+            except httpx.HTTPError as e:
+                raise JenkinsError(f"Jenkins request failed: {e}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise JenkinsError(f"Jenkins returned {response.status_code} for {url}")
+        return response.json()
+
+def create_client(settings, transport=None):
+    # 젠킨스 대역(transport)을 쓰는 테스트 / 벤치마크가 아니면 토큰 없이 시작하지 않음
+    if transport is None and not settings.jenkins_token:
+        raise EnvironmentError("JENKINS_TOKEN environment variable must be set")
+    return JenkinsClient(
+        base_url=settings.jenkins_url,
+        job=settings.jenkins_job,
+        user=settings.jenkins_user,
+        token=settings.jenkins_token,
+        timeout=settings.jenkins_timeout,
+        max_connections=settings.jenkins_max_connections,
+        max_concurrency=settings.jenkins_max_concurrency,
+        retries=settings.jenkins_retries,
+        backoff=settings.jenkins_backoff,
+        transport=transport
+    )
@@ -0,0 +1,82 @@
+# 로컬 테스트용 젠킨스 대역 서버
+# 실행: uvicorn jenkins_stub:app --port 8081  (API 쪽은 JENKINS_URL=http://localhost:8081)
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import JSONResponse
+from os import getenv
+import random
+import secrets
+import time
+
+app = FastAPI()
+
+crumb_field = "Jenkins-Crumb"
+crumb = secrets.token_hex(16)
+fail_rate = float(getenv("STUB_FAIL_RATE", 0))  # 503 으로 응답할 확률 (재시도 확인용)
+queue_delay = float(getenv("STUB_QUEUE_DELAY", 1))  # 큐에서 빌드 시작까지 (초)
+build_duration = float(getenv("STUB_BUILD_DURATION", 3))  # 빌드 소요 시간 (초)
+build_fail_rate = float(getenv("STUB_BUILD_FAIL_RATE", 0))  # 빌드가 FAILURE 로 끝날 확률
+builds = []  # 받은 빌드 요청 기록 (큐 항목 번호 = 빌드 번호 = 순번)
+
+@app.get("/crumbIssuer/api/json")
+async def crumb_issuer():
+    return {"crumbRequestField": crumb_field, "crumb": crumb}
+
+@app.post("/job/{job}/buildWithParameters")
+async def build_with_parameters(job: str, request: Request):
+    if request.headers.get(crumb_field) != crumb:
+        raise HTTPException(status_code=403, detail="No valid crumb was included in the request")
+    if random.random() < fail_rate:
+        return Response(status_code=503)
+
+    form = await request.form()
+    builds.append({
+        "job": job,
+        "parameters": dict(form),
+        "queued_at": time.time(),
+        "result": "FAILURE" if random.random() < build_fail_rate else "SUCCESS"
+    })
+    queue_id = len(builds)
+    return Response(status_code=201, headers={"Location": f"{request.base_url}queue/item/{queue_id}/"})
+
+def find_build(number):
+    if not 1 <= number <= len(builds):
+        raise HTTPException(status_code=404, detail="Not found")
+    return builds[number - 1]
+
+@app.get("/queue/item/{queue_id}/api/json")
+async def queue_item(queue_id: int, request: Request):
+    build = find_build(queue_id)
+    item = {"id": queue_id, "cancelled": False}
+    if time.time() - build["queued_at"] < queue_delay:
+        item["why"] = "Waiting for next available executor"
+    else:
+        item["executable"] = {"number": queue_id, "url": f"{request.base_url}job/{build['job']}/{queue_id}/"}
+    return item
+
+@app.get("/job/{job}/{number}/api/json")
+async def build_info(job: str, number: int):
+    build = find_build(number)
+    started = build["queued_at"] + queue_delay
+    elapsed = time.time() - started
+    if build["job"] != job or elapsed < 0:
+        raise HTTPException(status_code=404, detail="Not found")
+    building = elapsed < build_duration
+    return {
+        "number": number,
+        "building": building,
+        "result": None if building else build["result"],
+        "timestamp": int(started * 1000),
+        "duration": 0 if building else int(build_duration * 1000)
+    }
+
+# 받은 빌드 요청 확인용
+@app.get("/_stub/builds")
+async def list_builds():
+    return JSONResponse(content=builds)
+
+# crumb 만료 흉내
+@app.post("/_stub/rotate-crumb")
+async def rotate_crumb():
+    global crumb
+    crumb = secrets.token_hex(16)
+    return {"crumb": crumb}
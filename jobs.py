@@ -0,0 +1,232 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from builds import EXPIRED, LOST, SUCCESS
+import asyncio
+import logging
+import metrics
+import pytz
+
+logger = logging.getLogger(__name__)
+
+tz = pytz.timezone('Asia/Seoul')
+
+# 작업 상태
+QUEUED = "queued"        # 작업 문서 생성됨, 디스패처에서 차례 대기 중
+TRIGGERED = "triggered"  # 젠킨스 빌드 요청 완료, 완료 대기 중
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TIMEOUT = "timeout"
+
+FINISHED = {SUCCEEDED, FAILED, TIMEOUT}
+
+# 작업 종류 (젠킨스 파라미터 type 과 동일)
+CREATE = "CREATE"
+UPDATE = "UPDATE"
+DELETE = "DELETE"
+
+
+def now():
+    return datetime.now(tz)
+
+
+# deadline / base_revision 은 젠킨스 빌드를 요청할 때 기록
+# traceparent: 요청의 trace 문맥 (빌드와 파이프라인 기록을 같은 trace 로 묶음)
+async def create_job(jobs, job_type, project_id, traceparent=None):
+    current = now()
+    data = {
+        "type": job_type,
+        "project_id": project_id,
+        "status": QUEUED,
+        "base_revision": None,
+        "traceparent": traceparent,
+        "error": None,
+        "created_at": current,
+        "updated_at": current,
+        "deadline": None,
+        "history": [{"status": QUEUED, "error": None, "at": current}],
+    }
+    result = await jobs.insert_one(data)
+    return str(result.inserted_id)
+
+
+# history: 거친 상태를 모두 남김 (상태가 금방 바뀌어도 이벤트 스트림이 놓치지 않도록)
+async def set_status(jobs, job_id, status, error=None, **fields):
+    current = now()
+    fields.update({"status": status, "error": error, "updated_at": current})
+    return await jobs.find_one_and_update(
+        {"_id": ObjectId(job_id)},
+        {"$set": fields, "$push": {"history": {"status": status, "error": error, "at": current}}}
+    )
+
+
+def deadline(timeout):
+    return now() + timedelta(seconds=timeout)
+
+
+# 상태는 그대로 두고 항목만 기록 (젠킨스 빌드 번호 / 결과 등)
+async def record(jobs, job_id, **fields):
+    await jobs.update_one({"_id": ObjectId(job_id)}, {"$set": fields})
+
+
+async def get_job(jobs, job_id):
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await jobs.find_one({"_id": ObjectId(job_id)})
+
+
+def to_view(job):
+    return {
+        "job_id": str(job["_id"]),
+        "type": job["type"],
+        "project_id": job["project_id"],
+        "status": job["status"],
+        "error": job.get("error"),
+        "build_number": job.get("build_number"),
+        "build_result": job.get("build_result"),
+        "build_duration": job.get("build_duration"),
+        "created_at": _aware(job["created_at"]).isoformat(),
+        "updated_at": _aware(job["updated_at"]).isoformat(),
+    }
+
+
+# 작업 완료 여부 판정: 완료면 True, 실패면 에러 메시지, 진행 중이면 None
+def check_done(job, project):
+    if job["type"] == CREATE:
+        if project and project.get("end_point", "NULL") != "NULL":
+            return True
+    elif job["type"] == UPDATE:
+        if not project:
+            return "Project not found"
+        revision = (project.get("meta_data") or {}).get("revision")
+        if revision is not None and job["base_revision"] is not None and revision > job["base_revision"]:
+            return True
+    elif job["type"] == DELETE:
+        if not project:
+            return True
+    return None
+
+
+# 진행 중인 모든 작업을 하나의 감시자에서 관리
+# 완료 감지는 ProjectHub 의 변경 알림과 BuildTracker 의 젠킨스 빌드 결과로, 타임아웃은 주기적인 점검으로 처리
+class JobWatcher:
+    def __init__(self, jobs, hub, interval=2, builds=None):
+        self.jobs = jobs
+        self.hub = hub
+        self.interval = interval
+        self.builds = builds
+        if builds is not None:
+            builds.add_listener(self._on_build)
+        self._watching = {}  # job_id -> (job, unsubscribe)
+        self._writes = set()  # 진행 중인 상태 기록 태스크
+        self._listeners = []  # 작업 종료 알림 (job, status, error)
+        self._task = None
+
+    async def start(self):
+        # 재시작 전에 트리거된 작업도 이어서 감시
+        for job in await self.jobs.find({"status": TRIGGERED}):
+            await self.watch(job)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for job_id in list(self._watching):
+            _, unsubscribe = self._watching.pop(job_id)
+            unsubscribe()
+        # 끝난 작업의 상태 기록은 마저 저장
+        await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def watching(self):
+        return len(self._watching)
+
+    async def watch(self, job):
+        job_id = str(job["_id"])
+        if job_id in self._watching:
+            return
+
+        def on_change(project):
+            self._check(job_id, project)
+
+        self._watching[job_id] = (job, self.hub.subscribe(job["project_id"], on_change))
+        if self.builds is not None and job.get("queue_url"):
+            self.builds.track(job_id, job["queue_url"], job.get("build_url"))
+        self._check(job_id, await self.hub.fetch(job["project_id"]))
+
+    def _check(self, job_id, project):
+        entry = self._watching.get(job_id)
+        if entry is None:
+            return
+        result = check_done(entry[0], project)
+        if result is True:
+            self._finish(job_id, SUCCEEDED)
+        elif result:
+            self._finish(job_id, FAILED, error=result)
+
+    # 젠킨스 빌드 번호를 받으면 기록하고, 결과가 나오면 타임아웃을 기다리지 않고 바로 종료
+    # 프로젝트 문서로 이미 완료된 작업은 빌드 결과 / 소요 시간만 기록
+    def _on_build(self, build):
+        fields = {"build_number": build.number, "build_url": build.url}
+        if build.result is not None:
+            fields.update(build_result=build.result, build_duration=build.duration)
+        for job_id in list(build.job_ids):
+            if build.result is None or job_id not in self._watching:
+                self._spawn(record(self.jobs, job_id, **fields))
+            elif build.result == SUCCESS:
+                self._finish(job_id, SUCCEEDED, **fields)
+            elif build.result == EXPIRED:
+                self._finish(job_id, TIMEOUT, error="Jenkins build did not finish in time", **fields)
+            elif build.result == LOST:
+                self._finish(job_id, FAILED, error="Jenkins queue item disappeared before the build started", **fields)
+            else:
+                self._finish(job_id, FAILED, error=f"Jenkins build finished with {build.result}", **fields)
+
+    # 허브 콜백은 동기 함수라 상태 기록은 별도 태스크로 실행
+    def _finish(self, job_id, status, error=None, **fields):
+        job, unsubscribe = self._watching.pop(job_id)
+        unsubscribe()
+        # 빌드는 끝날 때까지 계속 추적 (빌드 소요 시간 기록, 디스패처는 빌드가 끝나야 슬롯을 비움)
+        # 리스너는 빌드 번호 / 결과 등 함께 기록하는 항목까지 반영된 작업을 받음
+        job = {**job, **fields}
+        for listener in self._listeners:
+            try:
+                listener(job, status, error)
+            except Exception as e:
+                logger.exception("Job listener error: %s", e)
+        self._spawn(set_status(self.jobs, job_id, status, error=error, **fields))
+
+    def _spawn(self, write):
+        task = asyncio.create_task(self._write(write))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, write):
+        try:
+            await write
+        except Exception as e:
+            logger.warning("Job watcher error: %s", e)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            metrics.poll("job_timeouts")
+            current = now()
+            for job_id, (job, _) in list(self._watching.items()):
+                if job.get("deadline") and _aware(job["deadline"]) < current:
+                    metrics.timeout("job")
+                    self._finish(job_id, TIMEOUT, error="Jenkins job did not finish in time")
+
+
+# pymongo 는 기본적으로 tz 정보 없는 UTC datetime 을 돌려줌
+def _aware(value):
+    if value.tzinfo is None:
+        return pytz.utc.localize(value)
+    return value
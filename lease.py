@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# 여러 워커 / 레플리카 중 하나만 백그라운드 작업(디스패처, 작업 감시, 젠킨스 폴링)을 실행하도록 하는 리더 임대
+# 몽고 문서 하나({_id: name, owner, expires_at})를 만료 전에 갱신하는 쪽이 리더
+# DB_BACKEND=memory 이면 같은 코드가 프로세스 안의 메모리 컬렉션을 잠금처럼 사용
+class Lease:
+    def __init__(self, collection, name="leader", owner=None, ttl=15, interval=5):
+        self.collection = collection
+        self.name = name
+        self.owner = owner or default_owner()
+        self.ttl = ttl
+        self.interval = interval
+        self.is_leader = False
+        self.elections = 0
+        self._valid_until = 0.0  # 마지막 갱신 기준 임대가 유효한 시각 (monotonic)
+        self._listeners = []  # async (is_leader) 리더가 되거나 물러날 때
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    # 다른 레플리카가 바로 이어받을 수 있도록 임대를 반납 (리스너는 호출하지 않음)
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            self.is_leader = False
+            try:
+                await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+            except PyMongoError as e:
+                logger.warning("Could not release leader lease: %s", e)
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    # 임대가 비었거나 만료되었거나 이미 내 것이면 가져옴
+    async def acquire(self):
+        now = datetime.now(timezone.utc)
+        started = time.monotonic()
+        try:
+            await self.collection.find_one_and_update(
+                {"_id": self.name, "$or": [{"owner": self.owner}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.ttl), "renewed_at": now}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # 다른 레플리카가 유효한 임대를 가지고 있음
+            return False
+        self._valid_until = started + self.ttl
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                leader = await self.acquire()
+            except PyMongoError as e:
+                # 몽고에 닿지 않으면 마지막 갱신이 유효한 동안만 리더로 남음
+                logger.warning("Leader lease renewal failed: %s", e)
+                leader = self.is_leader and time.monotonic() < self._valid_until - self.interval
+            if leader != self.is_leader:
+                await self._change(leader)
+            await asyncio.sleep(self.interval)
+
+    async def _change(self, leader):
+        self.is_leader = leader
+        if leader:
+            self.elections += 1
+        logger.info("%s leader lease %s as %s", "Acquired" if leader else "Lost", self.name, self.owner)
+        for listener in self._listeners:
+            try:
+                await listener(leader)
+            except Exception as e:
+                logger.exception("Leader listener error: %s", e)
+                if leader:
+                    # 리더 작업을 시작하지 못하면 임대를 반납하고 다음 주기에 다시 시도
+                    await self._change(False)
+                    try:
+                        await self.collection.delete_one({"_id": self.name, "owner": self.owner})
+                    except PyMongoError:
+                        pass
+                    return
+
+    def stats(self):
+        return {"leader": int(self.is_leader), "elections": self.elections}
+
+def create_lease(collection, settings):
+    return Lease(
+        collection, name=settings.leader_lease_name, ttl=settings.leader_lease_ttl,
+        interval=settings.leader_renew_interval
+    )
@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+# 요청 / 외부 호출 지연 시간 구간 (초)
+buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 이벤트 루프 지연 구간 (초)
+lag_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# 모듈 전역 계측 함수 (setup 전이나 METRICS_ENABLED=false 이면 아무것도 하지 않음)
+_metrics = None
+
+class _StatsCollector:
+    def __init__(self):
+        self.sources = []  # (이름, stats 함수)
+
+    def collect(self):
+        for name, stats in self.sources:
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning("Metrics collector error: %s", e)
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield GaugeMetricFamily(f"cloudcrew_{name}_{key}", f"{name} {key}", value=value)
+
+class Metrics:
+    def __init__(self):
+        self.registry = prometheus_client.CollectorRegistry()
+        self.requests = prometheus_client.Histogram(
+            "cloudcrew_http_request_duration_seconds", "HTTP request latency",
+            ["method", "route", "status"], buckets=buckets, registry=self.registry
+        )
+        self.backend = prometheus_client.Histogram(
+            "cloudcrew_backend_call_duration_seconds", "Backend call latency (mongo / storage / jenkins)",
+            ["backend", "op"], buckets=buckets, registry=self.registry
+        )
+        self.backend_errors = prometheus_client.Counter(
+            "cloudcrew_backend_call_errors_total", "Failed backend calls",
+            ["backend", "op"], registry=self.registry
+        )
+        self.waiters = prometheus_client.Gauge(
+            "cloudcrew_deployment_waiters", "Coroutines currently waiting on a deployment",
+            ["endpoint"], registry=self.registry
+        )
+        self.polls = prometheus_client.Counter(
+            "cloudcrew_poll_iterations_total", "Poll loop iterations",
+            ["loop"], registry=self.registry
+        )
+        self.timeouts = prometheus_client.Counter(
+            "cloudcrew_timeouts_total", "Waits that ended in a timeout",
+            ["kind"], registry=self.registry
+        )
+        self.loop_lag = prometheus_client.Histogram(
+            "cloudcrew_event_loop_lag_seconds", "Delay of the event loop monitor callback",
+            buckets=lag_buckets, registry=self.registry
+        )
+        self.loop_stalls = prometheus_client.Counter(
+            "cloudcrew_event_loop_stalls_total", "Times the event loop was blocked longer than LOOP_STALL_THRESHOLD",
+            registry=self.registry
+        )
+        self.stats = _StatsCollector()
+        self.registry.register(self.stats)
+
+def setup(enabled=True):
+    global _metrics
+    if not enabled:
+        _metrics = None
+        return None
+    if prometheus_client is None:
+        raise RuntimeError("METRICS_ENABLED requires the prometheus-client package")
+    _metrics = Metrics()
+    return _metrics
+
+def enabled():
+    return _metrics is not None
+
+def observe(backend, op, seconds, error=False):
+    if _metrics is None:
+        return
+    _metrics.backend.labels(backend, op).observe(seconds)
+    if error:
+        _metrics.backend_errors.labels(backend, op).inc()
+
+# 외부 호출 시간 측정
+@contextmanager
+def timed(backend, op):
+    if _metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        observe(backend, op, time.perf_counter() - start, error)
+
+# 배포 완료를 기다리는 동안 게이지 증가
+@contextmanager
+def waiting(endpoint):
+    if _metrics is None:
+        yield
+        return
+    gauge = _metrics.waiters.labels(endpoint)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+def poll(loop):
+    if _metrics is not None:
+        _metrics.polls.labels(loop).inc()
+
+def timeout(kind):
+    if _metrics is not None:
+        _metrics.timeouts.labels(kind).inc()
+
+def loop_lag(seconds):
+    if _metrics is not None:
+        _metrics.loop_lag.observe(seconds)
+
+def loop_stall():
+    if _metrics is not None:
+        _metrics.loop_stalls.inc()
+
+# 수집할 때마다 stats() 의 숫자 항목을 게이지로 내보냄 (캐시, 디스패처 등)
+def register_stats(name, stats):
+    if _metrics is not None:
+        _metrics.stats.sources.append((name, stats))
+
+def render():
+    return prometheus_client.generate_latest(_metrics.registry), prometheus_client.CONTENT_TYPE_LATEST
+
+# 라우트 템플릿(/api/v1/projects/{project_id}) 과 상태 코드별 요청 지연 시간
+# 응답 본문을 다 보낼 때까지를 측정 (BaseHTTPMiddleware 보다 가벼운 순수 ASGI 미들웨어)
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _metrics is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            _metrics.requests.labels(scope["method"], path, str(status)).observe(time.perf_counter() - start)
+
+def create_metrics(settings):
+    return setup(settings.metrics_enabled)
@@ -0,0 +1,42 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timezone
+import base64
+import json
+
+class InvalidCursor(ValueError):
+    pass
+
+# 커서 = (정렬 키 값, _id) 를 base64 로 감싼 불투명 문자열 (정렬 키가 없는 문서는 null)
+def encode_cursor(doc, key):
+    value = doc.get(key)
+    if isinstance(value, datetime):
+        # pymongo 는 tz 정보 없는 UTC 로 돌려줌
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        value = {"$date": value.isoformat()}
+    raw = json.dumps({"v": value, "i": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        value = data["v"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(data["i"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise InvalidCursor("Invalid cursor")
+
+# (key, _id) 내림차순 정렬에서 커서 다음 페이지 조건
+# 정렬 키가 없는(null) 문서는 내림차순에서 맨 뒤에 오고 $lt 로는 찾을 수 없으므로 따로 포함
+def after_filter(cursor, key):
+    value, _id = decode_cursor(cursor)
+    if value is None:
+        return {key: None, "_id": {"$lt": _id}}
+    return {"$or": [
+        {key: {"$lt": value}},
+        {key: value, "_id": {"$lt": _id}},
+        {key: None}
+    ]}
@@ -0,0 +1,163 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from builds import EXPIRED, LOST
+from events import meta_data_ready
+from pagination import after_filter, encode_cursor
+import asyncio
+import logging
+import jobs
+
+logger = logging.getLogger(__name__)
+
+# 프로젝트 배포 이력 (helm revision 하나당 문서 하나, 추가만 함)
+# 프로젝트 문서에는 최신 meta_data 만 두고, 이력 / 롤백 화면은 이 컬렉션을 (project_id, revision) 인덱스로 페이지 단위 조회
+# 작업이 끝나면 기록하고, 빌드 결과 / 소요 시간은 젠킨스 빌드가 끝날 때 채움
+# CREATE 는 end_point 로 먼저 끝나므로 meta_data(helm 상태 / 차트 등)는 파이프라인이 기록할 때 채움
+# recorded_at TTL 인덱스로 ttl 초 뒤 삭제, 프로젝트마다 최근 keep 개만 남김 (0 이면 개수 제한 없음)
+class RevisionStore:
+    def __init__(self, collection, projects, storage, hub, ttl=180 * 86400, keep=100, meta_timeout=60):
+        self.collection = collection
+        self.projects = projects
+        self.storage = storage
+        self.hub = hub
+        self.ttl = ttl
+        self.keep = keep
+        self.meta_timeout = meta_timeout
+        self._writes = set()  # 진행 중인 기록 태스크
+        self._waits = set()  # meta_data 를 기다리는 태스크 (종료 시 취소)
+
+    async def create_indexes(self):
+        await self.collection.create_index([("project_id", 1), ("revision", -1)], unique=True)
+        await self.collection.create_index([("job_id", 1)])
+        await self.collection.create_index([("recorded_at", 1)], expireAfterSeconds=int(self.ttl))
+
+    async def stop(self):
+        for task in self._waits:
+            task.cancel()
+        await asyncio.gather(*self._waits, *self._writes, return_exceptions=True)
+
+    # JobWatcher 작업 종료 알림
+    def on_job_finished(self, job, status, error):
+        if job["type"] in (jobs.CREATE, jobs.UPDATE):
+            self._spawn(self.record(job, status))
+
+    # BuildTracker 빌드 알림
+    def on_build(self, build):
+        if build.result not in (None, EXPIRED, LOST):
+            self._spawn(self.record_build(build.job_ids, build.result, build.duration))
+
+    # 작업이 새 revision 을 만들었을 때만 기록 (같은 revision 은 처음 기록을 유지)
+    async def record(self, job, status):
+        project = await self.projects.find_one({"_id": ObjectId(job["project_id"])}, {"meta_data": 1})
+        if not project:
+            return None
+        meta_data = project.get("meta_data") or {}
+        revision = meta_data.get("revision")
+        if job["type"] == jobs.CREATE and revision is None:
+            revision = 1  # helm install 은 항상 revision 1, meta_data 는 나중에 채워짐
+        base = job.get("base_revision")
+        if revision is None or (job["type"] == jobs.UPDATE and base is not None and revision <= base):
+            return None
+
+        doc = {
+            "project_id": job["project_id"],
+            "revision": revision,
+            "job_id": str(job["_id"]),
+            "type": job["type"],
+            "status": status,
+            "values_key": self.storage.key_of(job.get("values_url")),
+            "values_digest": job.get("values_digest"),
+            "values_canonical_digest": job.get("values_canonical_digest"),
+            "build_number": job.get("build_number"),
+            "build_result": job.get("build_result"),
+            "build_duration": job.get("build_duration"),
+            "recorded_at": datetime.now(timezone.utc),
+        }
+        update = {"$setOnInsert": doc}
+        if meta_data_ready(project):
+            update["$set"] = meta_fields(meta_data)
+        else:
+            update["$setOnInsert"].update(dict.fromkeys(meta_fields({})))
+            task = asyncio.create_task(self._fill_meta(job["project_id"], revision))
+            self._waits.add(task)
+            task.add_done_callback(self._waits.discard)
+        await self.collection.update_one({"project_id": doc["project_id"], "revision": revision}, update, upsert=True)
+        if self.keep:
+            await self.collection.delete_many({"project_id": doc["project_id"], "revision": {"$lte": revision - self.keep}})
+        return revision
+
+    # 파이프라인이 meta_data 를 기록하면 같은 revision 의 기록에 채움
+    async def _fill_meta(self, project_id, revision):
+        try:
+            project = await self.hub.wait_for(project_id, meta_data_ready, self.meta_timeout)
+        except asyncio.TimeoutError:
+            logger.debug("meta_data for project %s did not arrive, revision %s left without it", project_id, revision)
+            return
+        meta_data = project["meta_data"]
+        if meta_data.get("revision") != revision:
+            return
+        await self._write(self.collection.update_one(
+            {"project_id": project_id, "revision": revision}, {"$set": meta_fields(meta_data)}
+        ))
+
+    async def record_build(self, job_ids, result, duration):
+        if job_ids:
+            await self.collection.update_many(
+                {"job_id": {"$in": list(job_ids)}}, {"$set": {"build_result": result, "build_duration": duration}}
+            )
+
+    # 최신 revision 부터 limit 개, after 는 이전 페이지의 커서
+    async def list(self, project_id, limit, after=None):
+        query = {"project_id": project_id}
+        if after:
+            query.update(after_filter(after, "revision"))
+        docs = await self.collection.find(query, sort=[("revision", -1)], limit=limit)
+        cursor = encode_cursor(docs[-1], "revision") if len(docs) == limit else None
+        return [to_view(doc) for doc in docs], cursor
+
+    def _spawn(self, write):
+        task = asyncio.create_task(self._write(write))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(self, write):
+        try:
+            await write
+        except Exception as e:
+            logger.warning("Failed to record revision: %s", e)
+
+def meta_fields(meta_data):
+    return {
+        "helm_status": meta_data.get("status"),
+        "chart": meta_data.get("chart"),
+        "app_version": meta_data.get("app_version"),
+        "last_deployed": meta_data.get("last_deployed"),
+    }
+
+def to_view(doc):
+    recorded_at = doc["recorded_at"]
+    # pymongo 는 tz 정보 없는 UTC 로 돌려줌
+    if recorded_at.tzinfo is None:
+        recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+    return {
+        "revision": doc["revision"],
+        "job_id": doc["job_id"],
+        "type": doc["type"],
+        "status": doc["status"],
+        "helm_status": doc.get("helm_status"),
+        "chart": doc.get("chart"),
+        "app_version": doc.get("app_version"),
+        "last_deployed": doc.get("last_deployed"),
+        "values_key": doc.get("values_key"),
+        "values_digest": doc.get("values_digest"),
+        "build_number": doc.get("build_number"),
+        "build_result": doc.get("build_result"),
+        "build_duration": doc.get("build_duration"),
+        "recorded_at": recorded_at.isoformat(),
+    }
+
+def create_revision_store(collection, projects, storage, hub, settings):
+    return RevisionStore(
+        collection, projects, storage, hub,
+        ttl=settings.revision_ttl, keep=settings.revision_keep, meta_timeout=settings.project_wait_timeout
+    )
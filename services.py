@@ -0,0 +1,406 @@
+from pymongo.errors import PyMongoError
+from bson import ObjectId
+from datetime import datetime
+import db_utils as db
+import jobs
+import jenkins_client
+from jenkins_client import JenkinsError
+from hub import ProjectHub
+from builds import create_tracker
+from cache import create_cache
+from events import EventBroadcaster, create_job_feed
+from storage import create_storage
+from dispatcher import Busy, create_dispatcher
+from lease import create_lease
+from idempotency import create_idempotency_store
+from direct_uploads import create_upload_sessions
+from revisions import create_revision_store
+import metrics
+import tracing
+import uploads
+import values as helm_values
+import asyncio
+import logging
+import pytz
+
+logger = logging.getLogger(__name__)
+
+tz = pytz.timezone('Asia/Seoul') # 모든 리눅스의 기본 time은 미국 혹은 영국 시간
+day_format = "%Y:%m:%d:%H:%M:%S"
+
+# day 문자열과 정렬용 day_at(datetime) 을 함께 기록
+def timestamps():
+    current = datetime.now(tz)
+    return {"day": current.strftime(day_format), "day_at": current}
+
+# 앱 하나가 쓰는 클라이언트와 백그라운드 작업 모음
+# 가져올 때(import)가 아니라 start() 에서 만들고, DB 가 필요한 준비 작업은 연결될 때까지 백그라운드에서 재시도
+class Services:
+    def __init__(self, settings, jenkins_transport=None):
+        self.settings = settings
+        self.jenkins_transport = jenkins_transport  # 테스트 / 벤치마크용 젠킨스 대역
+        self.ready = False
+        self.draining = False
+        self._prepare_task = None
+        self._intake_task = None
+        self._writes = set()  # 작업 종료 후 프로젝트 문서 기록
+        self._queued = (0.0, 0)  # 리더가 아닐 때 대기 작업 수 (조회 시각, 개수)
+
+    async def start(self):
+        settings = self.settings
+        uploads.configure(settings)
+
+        self.executor = db.create_executor(settings.db_executor_workers)
+        self.client = db.connect_to_db(settings)
+        self.collection = db.get_async_collection(self.client, settings.db_name, settings.col_name, self.executor)
+        self.job_collection = db.get_async_collection(
+            self.client, settings.db_name, settings.job_col_name, self.executor
+        )
+        self.lease_collection = db.get_async_collection(
+            self.client, settings.db_name, settings.lease_col_name, self.executor
+        )
+        self.idempotency = create_idempotency_store(
+            db.get_async_collection(self.client, settings.db_name, settings.idempotency_col_name, self.executor),
+            settings
+        )
+        self.storage = create_storage(settings)
+        self.uploads = create_upload_sessions(
+            db.get_async_collection(self.client, settings.db_name, settings.upload_col_name, self.executor),
+            self.storage, settings
+        )
+        self.jenkins = jenkins_client.create_client(settings, transport=self.jenkins_transport)
+
+        self.cache = create_cache(self.collection, settings)
+        self.hub = ProjectHub(
+            self.collection, interval=settings.hub_poll_interval,
+            change_stream=settings.hub_change_stream, cache=self.cache
+        )
+        self.hub.add_listener(self.cache.on_change)
+        self.broadcaster = EventBroadcaster(self.hub, settings.sse_queue_size)
+        # 작업 이벤트는 작업 문서에서 읽어 리더가 아닌 레플리카의 스트림에도 전달
+        self.job_feed = create_job_feed(self.job_collection, self.broadcaster, settings)
+        self.revisions = create_revision_store(
+            db.get_async_collection(self.client, settings.db_name, settings.revision_col_name, self.executor),
+            self.collection, self.storage, self.hub, settings
+        )
+
+        # 진행 중인 젠킨스 빌드 상태를 한 루프에서 폴링
+        self.builds = create_tracker(self.jenkins, settings)
+        self.job_watcher = jobs.JobWatcher(
+            self.job_collection, self.hub, interval=settings.job_check_interval, builds=self.builds
+        )
+        # 프로젝트별로 빌드를 하나씩 실행하고 대기 중인 UPDATE 는 합침 (리더가 될 때까지 멈춰 둠)
+        self.dispatcher = create_dispatcher(self.dispatch_build, settings)
+        self.dispatcher.pause()
+        self.builds.add_listener(self.dispatcher.on_build)
+        # 디스패처 / 작업 감시 / 젠킨스 폴링은 리더 하나만 실행, 조회와 이벤트 스트림은 모든 레플리카가 처리
+        self.lease = create_lease(self.lease_collection, settings)
+        self.lease.add_listener(self.on_leadership)
+        self.job_watcher.add_listener(self.dispatcher.on_job_finished)
+        self.job_watcher.add_listener(self.trace_build)
+        self.job_watcher.add_listener(self.revisions.on_job_finished)
+        self.job_watcher.add_listener(self.record_deployed_values)
+        self.builds.add_listener(self.revisions.on_build)
+
+        # 기존 통계를 /metrics 게이지로도 내보냄
+        metrics.register_stats("cache", self.cache.stats)
+        metrics.register_stats("dispatcher", self.dispatcher.stats)
+        metrics.register_stats("builds", lambda: {"tracking": self.builds.tracking(), "polls": self.builds.polls})
+        metrics.register_stats("events", lambda: {"streams": sum(self.broadcaster.watchers().values())})
+        metrics.register_stats("lease", self.lease.stats)
+        metrics.register_stats("idempotency", self.idempotency.stats)
+
+        self.hub.start()
+        self.job_feed.start()
+        self._prepare_task = asyncio.create_task(self._prepare())
+
+    # 인덱스 / 이전 문서 보정 / 커넥션 준비 후 리더 선출 시작 (DB 에 연결될 때까지 재시도)
+    async def _prepare(self):
+        delay = 1
+        while True:
+            try:
+                await self.job_collection.create_index([("status", 1)])
+                await self.job_collection.create_index([("project_id", 1), ("updated_at", 1)])
+                await self.collection.create_index([("day_at", -1), ("_id", -1)])
+                await self.idempotency.create_indexes()
+                await self.uploads.create_indexes()
+                await self.revisions.create_indexes()
+                await self.backfill_day_at()
+                await self.warm()
+                self.lease.start()
+                self.ready = True
+                logger.info("Services ready")
+                return
+            except PyMongoError as e:
+                logger.warning("Database not reachable, retrying in %ss: %s", delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    # 리더가 되면 재시작 / 이전 리더의 작업을 복구하고 감시 시작, 물러나면 모두 멈춤
+    async def on_leadership(self, leader):
+        if leader:
+            # 진행 중인 빌드가 먼저 자리를 잡은 뒤 감시 시작
+            self.dispatcher.restore(
+                await self.job_collection.find({"status": jobs.TRIGGERED}),
+                await self.job_collection.find({"status": jobs.QUEUED}, sort=[("created_at", 1)]),
+                self.timeout_of
+            )
+            self.dispatcher.resume()
+            await self.job_watcher.start()
+            self.builds.start()
+            self._intake_task = asyncio.create_task(self._intake())
+        else:
+            await self._stop_intake()
+            await self.job_watcher.stop()
+            await self.builds.stop()
+            self.dispatcher.pause()
+            self.dispatcher.clear()
+
+    def timeout_of(self, job):
+        return self.settings.job_timeout(job["type"])
+
+    # 다른 레플리카가 받은 작업(QUEUED 문서)을 주기적으로 대기열로 가져옴
+    async def _intake(self):
+        while True:
+            await asyncio.sleep(self.settings.job_check_interval)
+            metrics.poll("job_intake")
+            try:
+                queued = await self.job_collection.find({"status": jobs.QUEUED}, sort=[("created_at", 1)])
+            except PyMongoError as e:
+                logger.warning("Job intake failed: %s", e)
+                continue
+            self.dispatcher.restore([], queued, self.timeout_of)
+
+    async def _stop_intake(self):
+        if self._intake_task is not None:
+            self._intake_task.cancel()
+            await asyncio.gather(self._intake_task, return_exceptions=True)
+            self._intake_task = None
+
+    # 첫 요청이 연결 비용을 내지 않도록 몽고 / 저장소 / 젠킨스 커넥션을 미리 엶
+    # 몽고는 준비 단계에서 이미 확인했고, 저장소 / 젠킨스 실패는 요청 처리에 맡김
+    async def warm(self):
+        await self.collection.ping()
+        for name, ping in (("storage", self.storage.ping), ("jenkins", self.jenkins.ping)):
+            try:
+                await asyncio.wait_for(ping(), self.settings.health_check_timeout)
+            except Exception as e:
+                logger.warning("Could not warm %s connections: %s", name, e)
+
+    # 백엔드별 연결 상태 (readiness 점검용)
+    async def health(self):
+        async def check(ping):
+            try:
+                await asyncio.wait_for(ping(), self.settings.health_check_timeout)
+                return "ok"
+            except Exception as e:
+                return f"error: {e or type(e).__name__}"
+
+        mongo, storage, jenkins = await asyncio.gather(
+            check(self.collection.ping), check(self.storage.ping), check(self.jenkins.ping)
+        )
+        return {"mongo": mongo, "storage": storage, "jenkins": jenkins}
+
+    # 종료 전 진행 중인 빌드가 끝날 때까지 grace 초 동안 대기
+    # 새 빌드는 시작하지 않고, 남은 작업은 작업 문서(QUEUED / TRIGGERED)로 남아 다음 워커가 이어서 처리
+    async def drain(self, grace):
+        self.draining = True
+        self.dispatcher.pause()
+        if not self.ready:
+            return
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + grace
+        while self.dispatcher.in_flight() and loop.time() < deadline:
+            await asyncio.sleep(0.1)
+        if self.dispatcher.in_flight() or self.dispatcher.queued():
+            logger.info(
+                "Leaving %d running and %d queued builds to the job store",
+                self.dispatcher.in_flight(), self.dispatcher.queued()
+            )
+
+    async def stop(self):
+        if self._prepare_task is not None:
+            self._prepare_task.cancel()
+            await asyncio.gather(self._prepare_task, return_exceptions=True)
+        await self.lease.stop()
+        await self._stop_intake()
+        await self.job_watcher.stop()
+        await self.builds.stop()
+        await self.revisions.stop()
+        await asyncio.gather(*self._writes, return_exceptions=True)
+        await self.idempotency.stop()
+        await self.job_feed.stop()
+        await self.hub.stop()
+        await self.jenkins.close()
+        await self.cache.close()
+        self.storage.close()
+        self.client.close()
+        self.executor.shutdown(wait=False)
+
+    # day_at 이 없는(또는 null 인) 이전 문서를 day 문자열로 채움
+    # day 를 해석할 수 없으면 _id 의 생성 시각으로 채워 목록 페이지에서 빠지지 않도록 함
+    async def backfill_day_at(self):
+        for project in await self.collection.find({"day_at": None}, {"day": 1}):
+            try:
+                day_at = tz.localize(datetime.strptime(project["day"], day_format))
+            except (KeyError, TypeError, ValueError):
+                if not isinstance(project["_id"], ObjectId):
+                    continue
+                day_at = project["_id"].generation_time
+            await self.collection.update_one({"_id": project["_id"]}, {"$set": {"day_at": day_at}})
+
+    # 업로드한 파일을 가리키는 프로젝트 문서 필드
+    # 스트리밍 업로드(S3StreamWriter)는 내용 해시 경로, 직접 업로드(UploadedFile)는 projects/{project_id}/ 아래
+    def artifact_fields(self, name, file):
+        return {
+            f"{name}_url": self.storage.url(file.key),
+            f"{name}_digest": file.digest,
+            f"{name}_filename": file.filename,
+        }
+
+    # 프로젝트에 저장된 values 원본 (없으면 None)
+    async def current_values(self, project):
+        key = self.storage.key_of(project.get("values_url"))
+        if key is None:
+            return None
+        body = await self.storage.get_object(key)
+        return None if body is None else helm_values.parse(body)
+
+    # 마지막으로 배포에 성공한 values 의 digest (모르면 None => 항상 빌드)
+    # 이 기록이 생기기 전의 문서는 저장된 원본이 배포된 값이라고 보고 계산
+    async def values_digest(self, project):
+        if "deployed_values_digest" in project:
+            return project["deployed_values_digest"]
+        if "values_canonical_digest" in project:
+            return None  # 새 values 를 받았지만 아직 배포에 성공하지 못함
+        try:
+            current = await self.current_values(project)
+        except helm_values.InvalidValues:
+            return None
+        return None if current is None else helm_values.canonical_digest(current)
+
+    # 새 values 가 배포된 값과 같고, 저장된 values 도 같고, 대기 / 진행 중인 CREATE / UPDATE 가 없을 때만 변경 없음
+    # 배포 중인 다른 values 가 있으면 그 빌드가 끝난 뒤 이 값으로 되돌려야 하므로 저장하고 다시 빌드
+    async def values_unchanged(self, project, digest):
+        if digest != await self.values_digest(project):
+            return False
+        if project.get("values_canonical_digest", digest) != digest:
+            return False
+        pending = await self.job_collection.count_documents({
+            "project_id": str(project["_id"]),
+            "type": {"$in": [jobs.CREATE, jobs.UPDATE]},
+            "status": {"$in": [jobs.QUEUED, jobs.TRIGGERED]},
+        })
+        return not pending
+
+    # 새 작업을 받을 수 있는지 미리 확인 (대기열이 가득 차면 Busy => 429)
+    # 리더는 디스패처 대기열로, 리더가 아니면 작업 문서의 대기 작업 수로 판단 (요청마다 세지 않도록 1초 동안 재사용)
+    async def check_capacity(self):
+        if self.lease.is_leader:
+            self.dispatcher.check_capacity()
+            return
+        loop = asyncio.get_running_loop()
+        checked_at, queued = self._queued
+        if loop.time() - checked_at > 1:
+            queued = await self.job_collection.count_documents({"status": jobs.QUEUED})
+            self._queued = (loop.time(), queued)
+        if queued >= self.settings.dispatch_max_queue:
+            self.dispatcher.rejected += 1
+            raise Busy(self.settings.dispatch_retry_after)
+
+    # 작업 문서 생성 후 디스패처 대기열에 등록
+    async def queue_job(self, job_type, project_id):
+        with tracing.span("queue_job", **{"job.type": job_type}):
+            traceparent = tracing.traceparent()
+            job_id = await jobs.create_job(self.job_collection, job_type, project_id, traceparent=traceparent)
+            tracing.set_attributes({"job.id": job_id})
+        # 리더가 아니면 작업 문서만 남기고 리더가 가져감
+        if self.lease.is_leader:
+            self.dispatcher.submit(job_type, project_id, job_id, self.settings.job_timeout(job_type), trace=traceparent)
+        logger.debug("Queued %s job %s for project %s", job_type, job_id, project_id)
+        return job_id
+
+    async def fail_jobs(self, entry, error):
+        for job_id in entry.job_ids:
+            await jobs.set_status(self.job_collection, job_id, jobs.FAILED, error=error)
+
+    # 디스패처에서 차례가 된 작업 묶음의 젠킨스 빌드 요청 후 감시 대상으로 등록
+    # 요청 trace 에 이어서 기록하고, 젠킨스에는 traceparent 파라미터로 넘겨 파이프라인의 기록도 같은 trace 로 묶음
+    async def dispatch_build(self, entry):
+        attributes = {"project.id": entry.project_id, "job.type": entry.job_type, "job.count": len(entry.job_ids)}
+        with tracing.span("jenkins.dispatch", traceparent=entry.trace, **attributes):
+            return await self._dispatch_build(entry)
+
+    # 파라미터는 실행 시점의 프로젝트 문서로 만들어, 합쳐진 UPDATE 는 마지막 values 로 한 번만 빌드
+    async def _dispatch_build(self, entry):
+        project = await self.collection.find_one({"_id": ObjectId(entry.project_id)})
+        if not project:
+            await self.fail_jobs(entry, "Project not found")
+            return False
+
+        parameters = {
+            'type': entry.job_type,
+            'project_name': project.get("project_name"),
+            'project_id': entry.project_id
+        }
+        if entry.job_type == jobs.CREATE:
+            parameters['template_url'] = project["template_url"]
+        if entry.job_type in (jobs.CREATE, jobs.UPDATE):
+            parameters['values_url'] = project["values_url"]
+        if tracing.enabled():
+            parameters['traceparent'] = tracing.traceparent()
+
+        try:
+            with tracing.span("jenkins.trigger"):
+                response = await self.jenkins.trigger(parameters)
+                tracing.set_attributes({"http.status_code": response.status_code})
+            triggered = response.status_code == 201
+        except JenkinsError as e:
+            logger.warning("Failed to trigger Jenkins job: %s", e)
+            triggered = False
+        if not triggered:
+            await self.fail_jobs(entry, "Failed to trigger Jenkins job")
+            return False
+
+        # Location 헤더의 큐 항목으로 빌드 번호 / 결과를 추적 (없으면 프로젝트 문서로만 완료 판정)
+        fields = {"deadline": jobs.deadline(entry.timeout), "queue_url": response.headers.get("Location")}
+        if entry.job_type == jobs.UPDATE:
+            fields["base_revision"] = (project.get("meta_data") or {}).get("revision")
+        # 배포 이력에 남길 values (빌드 중 들어온 다음 수정과 섞이지 않도록 요청 시점 값)
+        if entry.job_type in (jobs.CREATE, jobs.UPDATE):
+            fields.update({
+                key: project.get(key) for key in ("values_url", "values_digest", "values_canonical_digest")
+            })
+        for job_id in entry.job_ids:
+            await self.job_watcher.watch(await jobs.set_status(self.job_collection, job_id, jobs.TRIGGERED, **fields))
+        logger.debug("Triggered %s build for project %s (%s)", entry.job_type, entry.project_id, fields["queue_url"])
+        return True
+
+    # 배포에 성공하면 빌드를 요청할 때 기록한 values 의 digest 를 배포된 값으로 기록
+    # 실패 / 타임아웃이면 그대로 두어 같은 values 로 다시 요청하면 다시 빌드
+    # digest 가 없으면 (해석할 수 없는 values 등) 기록하지 않음 (저장된 values 의 digest 와 달라 항상 빌드)
+    def record_deployed_values(self, job, status, error):
+        if status != jobs.SUCCEEDED or job["type"] not in (jobs.CREATE, jobs.UPDATE):
+            return
+        if job.get("values_canonical_digest") is None:
+            return
+        task = asyncio.create_task(self._record_deployed_values(job))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _record_deployed_values(self, job):
+        try:
+            await self.collection.update_one(
+                {"_id": ObjectId(job["project_id"])},
+                {"$set": {"deployed_values_digest": job.get("values_canonical_digest")}}
+            )
+            await self.cache.invalidate(job["project_id"])
+        except Exception as e:
+            logger.warning("Could not record deployed values for project %s: %s", job["project_id"], e)
+
+    # 젠킨스 빌드 요청부터 완료 감지(파이프라인의 몽고 기록)까지를 요청 trace 의 span 으로 기록
+    def trace_build(self, job, status, error):
+        tracing.record_span(
+            "jenkins.build", job.get("traceparent"), job["updated_at"], jobs.now(),
+            error=error, **{"job.id": str(job["_id"]), "job.type": job["type"], "job.status": status}
+        )
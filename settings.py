@@ -0,0 +1,153 @@
+from dataclasses import dataclass, fields
+from typing import Optional, Tuple
+from dotenv import load_dotenv
+import os
+
+# 모든 설정은 필드 이름을 대문자로 바꾼 환경 변수(.env 포함)로 바꿀 수 있음
+# 예) create_timeout => CREATE_TIMEOUT, cors_origins => CORS_ORIGINS (쉼표로 구분)
+@dataclass(frozen=True)
+class Settings:
+    log_level: str = "INFO"
+    shutdown_grace_period: float = 30  # 종료 시 진행 중인 빌드를 기다리는 최대 시간 (초)
+    health_check_timeout: float = 2  # readiness 점검에서 백엔드별 최대 대기 시간 (초)
+    cors_origins: Tuple[str, ...] = (
+        "http://cloudcrew.site",
+        "https://cloudcrew.site",
+        "http://www.cloudcrew.site",
+        "https://www.cloudcrew.site",
+    )
+
+    # 몽고 (DB_BACKEND=memory 이면 서버 없이 메모리 저장소)
+    db_backend: str = "mongo"
+    db_user: Optional[str] = None
+    db_pwd: Optional[str] = None
+    db_host: Optional[str] = None
+    db_port: int = 27017
+    db_name: Optional[str] = None
+    col_name: Optional[str] = None
+    job_col_name: str = "jobs"
+    lease_col_name: str = "leases"
+    idempotency_col_name: str = "idempotency_keys"
+    upload_col_name: str = "upload_sessions"
+    revision_col_name: str = "revisions"
+    db_max_pool_size: int = 100
+    db_min_pool_size: int = 0
+    db_max_idle_time_ms: int = 60000
+    db_connect_timeout_ms: int = 5000
+    db_socket_timeout_ms: int = 10000
+    db_server_selection_timeout_ms: int = 5000
+    db_wait_queue_timeout_ms: int = 5000
+    db_executor_workers: int = 32
+
+    # 저장소 (STORAGE_BACKEND=local 이면 로컬 디렉터리)
+    storage_backend: str = "s3"
+    storage_bucket: str = "cc-helm-templates"
+    storage_local_root: str = ".storage"
+    s3_max_pool_connections: int = 50
+    s3_max_attempts: int = 5
+    s3_retry_mode: str = "adaptive"
+    s3_connect_timeout: float = 5
+    s3_read_timeout: float = 60
+    s3_part_size: int = 8 * 1024 * 1024
+    s3_upload_concurrency: int = 4
+    blob_index_size: int = 10000
+    # 브라우저 직접 업로드 (presigned PUT URL 유효 시간 / 세션 보관 시간 / 파일 최대 크기)
+    presign_expires: float = 900
+    upload_session_ttl: float = 3600
+    upload_max_size: int = 64 * 1024 * 1024
+    upload_lock_timeout: float = 60
+    # PUT / PATCH 로 받는 values 최대 크기 (해석해서 비교하므로 메모리로 받음)
+    values_max_size: int = 1024 * 1024
+
+    # 젠킨스
+    jenkins_url: str = "http://10.0.1.85:8080"
+    jenkins_job: str = "CloudCrew-JOB"
+    jenkins_user: str = "admin"
+    jenkins_token: Optional[str] = None  # JENKINS_TOKEN 필수 (소스에 두지 않음)
+    jenkins_timeout: float = 10
+    jenkins_max_connections: int = 20
+    jenkins_max_concurrency: int = 10
+    jenkins_retries: int = 3
+    jenkins_backoff: float = 0.5
+    jenkins_poll_interval: float = 2
+    jenkins_track_max_age: float = 3600
+    jenkins_queue_lost_grace: float = 60
+    jenkins_max_inflight: int = 10
+    dispatch_max_queue: int = 100
+    dispatch_retry_after: int = 5
+
+    # 작업 종류별 젠킨스 완료 대기 시간 / 타임아웃 점검 주기 (초)
+    create_timeout: float = 30
+    update_timeout: float = 60
+    delete_timeout: float = 60
+    job_check_interval: float = 2
+
+    # 리더 선출 (리더 하나만 디스패처 / 작업 감시 / 젠킨스 폴링 실행, 임대 만료 시 다른 레플리카가 이어받음)
+    leader_lease_name: str = "leader"
+    leader_lease_ttl: float = 15
+    leader_renew_interval: float = 5
+
+    # 프로젝트 변경 감시 (change stream 을 쓸 수 없으면 폴링)
+    hub_change_stream: bool = True
+    hub_poll_interval: float = 2
+
+    # 캐시 (memory / redis / none)
+    cache_backend: str = "memory"
+    cache_ttl: float = 30
+    cache_max_size: int = 10000
+    cache_redis_url: str = "redis://localhost:6379/0"
+
+    # API
+    project_page_size: int = 100
+    project_max_page_size: int = 500
+    project_wait_timeout: float = 60  # 단일 조회에서 meta_data 를 기다리는 최대 시간
+    batch_max_projects: int = 500
+    batch_max_wait: float = 60
+    idempotency_ttl: float = 86400  # Idempotency-Key 응답 보관 시간 (초)
+    idempotency_lock_timeout: float = 60  # 처리 중 멈춘 요청의 키를 다른 요청이 이어받기까지 (초)
+    revision_ttl: float = 180 * 86400  # 배포 이력 보관 시간 (초)
+    revision_keep: int = 100  # 프로젝트마다 남길 최근 배포 이력 수 (0 이면 제한 없음)
+    revision_page_size: int = 20
+    revision_max_page_size: int = 100
+    sse_keepalive: float = 15
+    sse_queue_size: int = 100
+    sse_job_interval: float = 1  # 작업 이벤트(작업 컬렉션) 조회 주기 (초)
+    gzip_min_size: int = 1024  # 이 크기 이상의 응답만 압축 (0 이면 압축 안 함)
+    gzip_level: int = 5
+
+    # 관측 (TRACING_EXPORTER: none / otlp / file)
+    metrics_enabled: bool = True
+    tracing_exporter: str = "none"
+    tracing_service_name: str = "cloudcrew-be"
+    tracing_file: str = "traces.jsonl"
+    # 이벤트 루프 지연 / 블로킹 호출 감시 (/debug/loop, 지표 cloudcrew_event_loop_*)
+    loop_monitor_enabled: bool = False
+    loop_monitor_interval: float = 0.05  # 지연 측정 주기 (초)
+    loop_stall_threshold: float = 0.1  # 이 시간 넘게 루프가 멈추면 스택 기록 (초)
+    loop_stall_history: int = 20  # 보관할 최근 멈춤 기록 수
+
+    @classmethod
+    def from_env(cls, env_file=".env", **overrides):
+        # 이미 설정된 환경 변수가 .env 보다 우선
+        load_dotenv(env_file, override=False)
+        values = {}
+        for field in fields(cls):
+            raw = os.environ.get(field.name.upper())
+            if raw is not None:
+                values[field.name] = _convert(raw, field.type)
+        values.update(overrides)
+        return cls(**values)
+
+    def job_timeout(self, job_type):
+        return {"CREATE": self.create_timeout, "UPDATE": self.update_timeout, "DELETE": self.delete_timeout}[job_type]
+
+def _convert(raw, kind):
+    if kind is bool:
+        return raw.strip().lower() in ("1", "true", "yes", "on")
+    if kind is int:
+        return int(raw)
+    if kind is float:
+        return float(raw)
+    if kind == Tuple[str, ...]:
+        return tuple(item.strip() for item in raw.split(",") if item.strip())
+    return raw
@@ -0,0 +1,284 @@
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import base64
+import boto3
+import hashlib
+import metrics
+import os
+import shutil
+import time
+import uuid
+
+# 저장소가 presigned URL 을 발급할 수 없음 (로컬 저장소)
+class PresignUnsupported(Exception):
+    pass
+
+# 작업(put_object, head_object ...)별 호출 수 / 오류 수 / 소요 시간
+class OperationMetrics:
+    def __init__(self):
+        self._ops = {}
+
+    def record(self, op, seconds, error=False):
+        stats = self._ops.setdefault(op, {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+        stats["count"] += 1
+        stats["errors"] += int(error)
+        stats["total_seconds"] += seconds
+        stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def snapshot(self):
+        return {
+            op: {**stats, "avg_seconds": stats["total_seconds"] / stats["count"]}
+            for op, stats in self._ops.items()
+        }
+
+# 블로킹 호출을 전용 스레드 풀에서 실행하고 작업별로 기록
+class _ExecutorStorage:
+    def __init__(self, workers, thread_name_prefix):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self.metrics = OperationMetrics()
+
+    async def _call(self, op, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        error = False
+        try:
+            return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+        except Exception:
+            error = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.metrics.record(op, seconds, error)
+            metrics.observe("storage", op, seconds, error)
+
+    async def exists(self, key):
+        return await self.head(key) is not None
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+class S3Storage(_ExecutorStorage):
+    def __init__(self, bucket, max_pool_connections=50, max_attempts=5, retry_mode="adaptive",
+                 connect_timeout=5, read_timeout=60):
+        super().__init__(max_pool_connections, "s3")
+        self.bucket = bucket
+        self.client = boto3.client("s3", config=Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": max_attempts, "mode": retry_mode},
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout
+        ))
+
+    def url(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+    # url() 의 반대 (이 버킷의 주소가 아니면 None)
+    def key_of(self, url):
+        prefix = f"s3://{self.bucket}/"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def _get(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["Body"].read()
+
+    # 없으면 None (작은 파일용, 본문 전체를 메모리로 읽음)
+    async def get_object(self, key):
+        return await self._call("get_object", self._get, key)
+
+    # 버킷 접근 확인 (첫 호출에서 커넥션 풀과 자격 증명을 준비)
+    async def ping(self):
+        await self._call("head_bucket", self.client.head_bucket, Bucket=self.bucket)
+
+    async def put_object(self, key, body, checksum_sha256=None):
+        kwargs = {"ChecksumSHA256": base64.b64encode(checksum_sha256).decode()} if checksum_sha256 else {}
+        await self._call("put_object", self.client.put_object, Bucket=self.bucket, Key=key, Body=body, **kwargs)
+
+    # 브라우저가 직접 올리는 PUT URL (서명에 sha256 체크섬을 넣어 다른 내용은 S3 가 거절)
+    # 반환: {"url", "headers"} - headers 는 PUT 요청에 그대로 붙여야 함
+    async def presign_put(self, key, expires, checksum_sha256):
+        checksum = base64.b64encode(checksum_sha256).decode()
+        url = await self._call(
+            "presign_put", self.client.generate_presigned_url, "put_object",
+            Params={"Bucket": self.bucket, "Key": key, "ChecksumSHA256": checksum}, ExpiresIn=int(expires)
+        )
+        return {"url": url, "headers": {"x-amz-checksum-sha256": checksum}}
+
+    # 없으면 None, 있으면 {"size", "etag"}
+    async def head(self, key):
+        try:
+            response = await self._call("head_object", self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": response["ContentLength"], "etag": response["ETag"]}
+
+    async def delete_object(self, key):
+        await self._call("delete_object", self.client.delete_object, Bucket=self.bucket, Key=key)
+
+    async def copy_object(self, source_key, key):
+        await self._call(
+            "copy_object", self.client.copy_object,
+            Bucket=self.bucket, Key=key, CopySource={"Bucket": self.bucket, "Key": source_key}
+        )
+
+    async def create_multipart_upload(self, key):
+        response = await self._call(
+            "create_multipart_upload", self.client.create_multipart_upload, Bucket=self.bucket, Key=key
+        )
+        return response["UploadId"]
+
+    async def upload_part(self, key, upload_id, number, body):
+        response = await self._call(
+            "upload_part", self.client.upload_part,
+            Bucket=self.bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body
+        )
+        return response["ETag"]
+
+    async def complete_multipart_upload(self, key, upload_id, parts):
+        await self._call(
+            "complete_multipart_upload", self.client.complete_multipart_upload,
+            Bucket=self.bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    async def abort_multipart_upload(self, key, upload_id):
+        await self._call(
+            "abort_multipart_upload", self.client.abort_multipart_upload,
+            Bucket=self.bucket, Key=key, UploadId=upload_id
+        )
+
+# 로컬 디렉터리를 버킷처럼 쓰는 저장소 (테스트/로컬 개발용)
+class LocalStorage(_ExecutorStorage):
+    def __init__(self, root, bucket, workers=8):
+        super().__init__(workers, "storage")
+        self.bucket = bucket
+        self.root = os.path.abspath(os.path.join(root, bucket))
+        self._multipart = os.path.join(self.root, ".multipart")
+
+    def _ping(self):
+        os.makedirs(self.root, exist_ok=True)
+
+    async def ping(self):
+        await self._call("ping", self._ping)
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid key: {key}")
+        return path
+
+    def url(self, key):
+        return f"file://{self._path(key)}"
+
+    def key_of(self, url):
+        prefix = f"file://{self.root}{os.sep}"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+    def _get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def get_object(self, key):
+        return await self._call("get_object", self._get, key)
+
+    def _write(self, path, body):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+
+    def _put(self, key, body, checksum_sha256):
+        if checksum_sha256 is not None and hashlib.sha256(body).digest() != checksum_sha256:
+            raise ValueError("Checksum mismatch")
+        self._write(self._path(key), body)
+
+    def _head(self, key):
+        path = self._path(key)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as f:
+            etag = hashlib.md5(f.read()).hexdigest()
+        return {"size": os.path.getsize(path), "etag": f'"{etag}"'}
+
+    def _delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _copy(self, source_key, key):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(self._path(source_key), path)
+
+    def _create_multipart(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self._multipart, upload_id))
+        return upload_id
+
+    def _upload_part(self, upload_id, number, body):
+        self._write(os.path.join(self._multipart, upload_id, f"{number:05d}"), body)
+        return f'"{hashlib.md5(body).hexdigest()}"'
+
+    def _complete(self, key, upload_id, parts):
+        directory = os.path.join(self._multipart, upload_id)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            for part in parts:
+                with open(os.path.join(directory, f"{part['PartNumber']:05d}"), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        shutil.rmtree(directory)
+
+    async def put_object(self, key, body, checksum_sha256=None):
+        await self._call("put_object", self._put, key, body, checksum_sha256)
+
+    async def head(self, key):
+        return await self._call("head_object", self._head, key)
+
+    async def presign_put(self, key, expires, checksum_sha256):
+        raise PresignUnsupported("Presigned uploads require STORAGE_BACKEND=s3")
+
+    async def delete_object(self, key):
+        await self._call("delete_object", self._delete, key)
+
+    async def copy_object(self, source_key, key):
+        await self._call("copy_object", self._copy, source_key, key)
+
+    async def create_multipart_upload(self, key):
+        return await self._call("create_multipart_upload", self._create_multipart, key)
+
+    async def upload_part(self, key, upload_id, number, body):
+        return await self._call("upload_part", self._upload_part, upload_id, number, body)
+
+    async def complete_multipart_upload(self, key, upload_id, parts):
+        await self._call("complete_multipart_upload", self._complete, key, upload_id, parts)
+
+    async def abort_multipart_upload(self, key, upload_id):
+        await self._call(
+            "abort_multipart_upload", shutil.rmtree, os.path.join(self._multipart, upload_id), ignore_errors=True
+        )
+
+def create_storage(settings):
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.storage_local_root, settings.storage_bucket)
+    return S3Storage(
+        settings.storage_bucket,
+        max_pool_connections=settings.s3_max_pool_connections,
+        max_attempts=settings.s3_max_attempts,
+        retry_mode=settings.s3_retry_mode,
+        connect_timeout=settings.s3_connect_timeout,
+        read_timeout=settings.s3_read_timeout
+    )
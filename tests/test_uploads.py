@@ -0,0 +1,186 @@
+from settings import Settings
+from storage import create_storage
+import asyncio
+import hashlib
+import os
+import pytest
+import uploads
+
+part_size = uploads.min_part_size
+
+
+@pytest.fixture
+def settings(tmp_path):
+    return Settings(
+        storage_backend="local", storage_local_root=str(tmp_path), storage_bucket="bucket",
+        s3_part_size=part_size, s3_upload_concurrency=2
+    )
+
+
+@pytest.fixture
+def storage(settings, monkeypatch):
+    for name in ("known_blobs", "default_part_size", "default_part_concurrency"):
+        monkeypatch.setattr(uploads, name, getattr(uploads, name))
+    uploads.known_blobs = uploads.BlobIndex(100)
+    uploads.configure(settings)
+    storage = create_storage(settings)
+    yield storage
+    storage.close()
+
+
+def body_of(size):
+    return os.urandom(size)
+
+
+def multipart_uploads(storage):
+    path = os.path.join(storage.root, ".multipart")
+    return os.listdir(path) if os.path.isdir(path) else []
+
+
+async def upload(storage, body, chunk_size=64 * 1024):
+    writer = uploads.S3StreamWriter(storage, "chart.tgz")
+    for start in range(0, len(body), chunk_size):
+        await writer.write(body[start:start + chunk_size])
+    return await writer.close()
+
+
+# 업로드 파트 / 복사 요청을 기록하는 로컬 저장소 (fail_part 번호의 파트는 실패)
+class RecordingStorage:
+    def __init__(self, storage, fail_part=None):
+        self.storage = storage
+        self.fail_part = fail_part
+        self.parts = []
+        self.calls = []
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)
+
+    async def upload_part(self, key, upload_id, number, body):
+        self.parts.append((number, len(body)))
+        if number == self.fail_part:
+            raise OSError("part upload failed")
+        return await self.storage.upload_part(key, upload_id, number, body)
+
+    async def put_object(self, key, body, checksum_sha256=None):
+        self.calls.append("put_object")
+        await self.storage.put_object(key, body, checksum_sha256=checksum_sha256)
+
+    async def copy_object(self, source_key, key):
+        self.calls.append("copy_object")
+        await self.storage.copy_object(source_key, key)
+
+    async def abort_multipart_upload(self, key, upload_id):
+        self.calls.append("abort_multipart_upload")
+        await self.storage.abort_multipart_upload(key, upload_id)
+
+
+def test_configure_keeps_s3_minimum_part_size(settings, storage):
+    uploads.configure(Settings(s3_part_size=1024))
+    assert uploads.default_part_size == uploads.min_part_size
+    uploads.configure(settings)
+    assert uploads.default_part_size == part_size
+
+
+def test_large_file_is_split_into_parts(storage):
+    body = body_of(2 * part_size + 1234)
+    recording = RecordingStorage(storage)
+
+    writer = asyncio.run(upload(recording, body))
+
+    digest = hashlib.sha256(body).hexdigest()
+    assert writer.digest == f"sha256:{digest}"
+    assert writer.key == uploads.blob_key(digest)
+    assert writer.size == len(body)
+    assert writer.uploaded
+    assert sorted(recording.parts) == [(1, part_size), (2, part_size), (3, 1234)]
+    assert recording.calls == ["copy_object"]
+    assert asyncio.run(storage.get_object(writer.key)) == body
+    # 임시 키와 멀티파트 조각은 남지 않음
+    assert not os.listdir(os.path.join(storage.root, uploads.staging_prefix))
+    assert multipart_uploads(storage) == []
+
+
+def test_small_file_uses_single_put(storage):
+    body = body_of(1024)
+    recording = RecordingStorage(storage)
+
+    writer = asyncio.run(upload(recording, body))
+
+    assert recording.parts == []
+    assert recording.calls == ["put_object"]
+    assert asyncio.run(storage.get_object(writer.key)) == body
+
+
+def test_failed_part_aborts_upload(storage):
+    body = body_of(3 * part_size)
+    recording = RecordingStorage(storage, fail_part=2)
+
+    with pytest.raises(OSError):
+        asyncio.run(upload(recording, body))
+
+    assert "abort_multipart_upload" in recording.calls
+    assert "copy_object" not in recording.calls
+    assert multipart_uploads(storage) == []
+    assert asyncio.run(storage.get_object(uploads.blob_key(hashlib.sha256(body).hexdigest()))) is None
+
+
+def test_existing_blob_is_not_stored_again(storage):
+    large = body_of(part_size + 1)
+    small = body_of(1024)
+
+    async def run():
+        first = await upload(storage, large)
+        await upload(storage, small)
+        # 다른 레플리카가 저장한 blob 처럼 HEAD 로 확인하도록 인덱스를 비움
+        uploads.known_blobs = uploads.BlobIndex(100)
+        recording = RecordingStorage(storage)
+        second = await upload(recording, large)
+        third = await upload(recording, small)
+        return first, second, third, recording
+
+    first, second, third, recording = asyncio.run(run())
+
+    assert second.key == first.key
+    assert not second.uploaded and not third.uploaded
+    # 큰 파일은 멀티파트로 받은 뒤 복사만 생략, 작은 파일은 업로드 자체를 생략
+    assert recording.calls == []
+    assert len(os.listdir(os.path.join(storage.root, uploads.blob_prefix))) == 2
+    assert multipart_uploads(storage) == []
+
+
+# 요청 본문을 chunk_size 단위로 흘려보내는 요청 대역
+class FormRequest:
+    def __init__(self, body, boundary, chunk_size=256 * 1024):
+        self.headers = {"content-type": f"multipart/form-data; boundary={boundary}"}
+        self.body = body
+        self.chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            yield self.body[start:start + self.chunk_size]
+
+
+def form_body(boundary, fields, files):
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'.encode() + value)
+    for name, (filename, value) in files.items():
+        header = f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+        parts.append(f"{header}Content-Type: application/octet-stream\r\n\r\n".encode() + value)
+    return b"\r\n".join(parts) + f"\r\n--{boundary}--\r\n".encode()
+
+
+def test_form_streams_files_to_storage(storage):
+    boundary = "test-boundary"
+    template = body_of(part_size + 4321)
+    values = b"replicaCount: 2\n"
+    files = {"template": ("chart.tgz", template), "values": ("values.yaml", values)}
+    request = FormRequest(form_body(boundary, {"project_name": b"demo"}, files), boundary)
+
+    fields, files = asyncio.run(uploads.stream_form_to_storage(request, storage, {"template", "values"}))
+
+    assert fields == {"project_name": "demo"}
+    assert files["template"].filename == "chart.tgz"
+    assert asyncio.run(storage.get_object(files["template"].key)) == template
+    assert asyncio.run(storage.get_object(files["values"].key)) == values
+    assert multipart_uploads(storage) == []
@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+from datetime import timezone
+import functools
+
+# opentelemetry 는 TRACING_EXPORTER 를 켰을 때만 import (끄면 모든 함수가 아무것도 하지 않음)
+_tracer = None
+_provider = None
+_propagator = None
+
+def setup(exporter="none", service_name="cloudcrew-be", path="traces.jsonl"):
+    global _tracer, _provider, _propagator
+    if exporter == "none":
+        return None
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+    if exporter == "otlp":
+        # 수집기 주소는 OTEL_EXPORTER_OTLP_ENDPOINT / OTEL_EXPORTER_OTLP_TRACES_ENDPOINT
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter()
+    elif exporter == "file":
+        # 오프라인 분석용: span 하나당 JSON 한 줄
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        span_exporter = ConsoleSpanExporter(
+            out=open(path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}")
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    _tracer = _provider.get_tracer("cloudcrew")
+    _propagator = TraceContextTextMapPropagator()
+    return _tracer
+
+def enabled():
+    return _tracer is not None
+
+def _context(traceparent):
+    return _propagator.extract({"traceparent": traceparent}) if traceparent else None
+
+# 현재 span 의 자식 span (traceparent 를 주면 그 trace 에 이어서 생성)
+@contextmanager
+def span(name, traceparent=None, **attributes):
+    if _tracer is None:
+        yield None
+        return
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    with _tracer.start_as_current_span(name, context=_context(traceparent), attributes=attributes) as current:
+        yield current
+
+# 핸들러 전체를 span 으로 감쌈 (경로 파라미터 project_id 는 속성으로 기록)
+def traced(name):
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            with span(name, **{"project.id": kwargs.get("project_id")}):
+                return await handler(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def set_attributes(attributes):
+    if _tracer is None:
+        return
+    from opentelemetry import trace
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+# 젠킨스 빌드 파라미터 / 작업 문서로 넘길 현재 trace 문맥 (W3C traceparent)
+def traceparent():
+    if _tracer is None:
+        return None
+    carrier = {}
+    _propagator.inject(carrier)
+    return carrier.get("traceparent")
+
+# 이미 끝난 구간을 시작/종료 시각으로 기록 (젠킨스 빌드 ~ 파이프라인의 몽고 기록)
+def record_span(name, traceparent, start, end, error=None, **attributes):
+    if _tracer is None:
+        return
+    from opentelemetry.trace import Status, StatusCode
+    attributes = {key: value for key, value in attributes.items() if value is not None}
+    current = _tracer.start_span(name, context=_context(traceparent), attributes=attributes, start_time=_ns(start))
+    if error:
+        current.set_status(Status(StatusCode.ERROR, error))
+    current.end(end_time=_ns(end))
+
+# pymongo 는 tz 정보 없는 UTC datetime 을 돌려줌
+def _ns(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1e9)
+
+def shutdown():
+    if _provider is not None:
+        _provider.shutdown()
+
+# TRACING_EXPORTER: none / otlp / file (TRACING_FILE 에 기록)
+def create_tracing(settings):
+    return setup(settings.tracing_exporter, service_name=settings.tracing_service_name, path=settings.tracing_file)
@@ -0,0 +1,288 @@
+from multipart.multipart import MultipartParser, parse_options_header
+from collections import OrderedDict
+import asyncio
+import hashlib
+import uuid
+
+# 멀티파트 업로드 파트 크기 (S3 최소 5MiB, 마지막 파트 제외) / 파일당 동시 업로드 파트 수
+min_part_size = 5 * 1024 * 1024
+default_part_size = 8 * 1024 * 1024
+default_part_concurrency = 4
+max_field_size = 64 * 1024
+
+class UploadError(ValueError):
+    pass
+
+# 요청 본문이 허용 크기를 넘음 => 413
+class BodyTooLarge(UploadError):
+    pass
+
+# 내용 해시 기반 저장 위치 (같은 내용은 한 번만 저장)
+blob_prefix = "blobs/sha256/"
+# 멀티파트 업로드 중인 큰 파일의 임시 위치 (버킷 수명 주기 규칙으로 정리)
+staging_prefix = "uploads/"
+
+def blob_key(hexdigest):
+    return f"{blob_prefix}{hexdigest}"
+
+# 이미 버킷에 있다고 확인된 blob 키 (HEAD 요청 생략용)
+class BlobIndex:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+
+    def __contains__(self, key):
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return True
+        return False
+
+    def add(self, key):
+        self._keys[key] = True
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.max_size:
+            self._keys.popitem(last=False)
+
+known_blobs = BlobIndex(10000)
+
+# S3_PART_SIZE / S3_UPLOAD_CONCURRENCY / BLOB_INDEX_SIZE 설정 반영
+def configure(settings):
+    global default_part_size, default_part_concurrency
+    default_part_size = max(settings.s3_part_size, min_part_size)
+    default_part_concurrency = settings.s3_upload_concurrency
+    known_blobs.max_size = settings.blob_index_size
+
+async def blob_exists(storage, key):
+    if key in known_blobs:
+        return True
+    if not await storage.exists(key):
+        return False
+    known_blobs.add(key)
+    return True
+
+# 파일 하나를 sha256 으로 주소를 정해 저장소(S3)에 저장
+# part_size 보다 작은 파일은 해시를 먼저 구해 이미 있으면 업로드 생략, 없으면 put_object 한 번 (S3 가 체크섬 검증)
+# 큰 파일은 임시 키로 멀티파트 업로드 후 blob 키로 서버 측 복사 (이미 있으면 복사 생략)
+class S3StreamWriter:
+    def __init__(self, storage, filename, part_size=None, concurrency=None):
+        self.storage = storage
+        self.filename = filename
+        self.part_size = part_size or default_part_size
+        self.size = 0
+        self.key = None
+        self.digest = None
+        self.uploaded = False  # 새 내용을 실제로 저장했는지
+        self._hash = hashlib.sha256()
+        self._staging_key = f"{staging_prefix}{uuid.uuid4().hex}"
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._tasks = []
+        self._slots = asyncio.Semaphore(concurrency or default_part_concurrency)
+
+    async def write(self, data):
+        self._hash.update(data)
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            chunk = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._upload_part(chunk)
+
+    async def _upload_part(self, chunk):
+        if self._upload_id is None:
+            self._upload_id = await self.storage.create_multipart_upload(self._staging_key)
+
+        # 빈 슬롯이 생길 때까지 요청 본문 읽기를 멈춤 (메모리 사용량 = part_size * concurrency)
+        await self._slots.acquire()
+        number = len(self._tasks) + 1
+        self._tasks.append(asyncio.create_task(self._send_part(number, chunk)))
+
+    async def _send_part(self, number, chunk):
+        try:
+            etag = await self.storage.upload_part(self._staging_key, self._upload_id, number, chunk)
+            self._parts.append({"PartNumber": number, "ETag": etag})
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        digest = self._hash.digest()
+        self.digest = f"sha256:{digest.hex()}"
+        self.key = blob_key(digest.hex())
+        try:
+            if self._upload_id is None:
+                if not await blob_exists(self.storage, self.key):
+                    await self.storage.put_object(self.key, bytes(self._buffer), checksum_sha256=digest)
+                    self.uploaded = True
+                    known_blobs.add(self.key)
+                self._buffer = bytearray()
+                return self
+
+            if self._buffer:
+                await self._upload_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            await asyncio.gather(*self._tasks)
+            await self.storage.complete_multipart_upload(
+                self._staging_key, self._upload_id,
+                sorted(self._parts, key=lambda part: part["PartNumber"])
+            )
+            self._upload_id = None
+            if not await blob_exists(self.storage, self.key):
+                await self.storage.copy_object(self._staging_key, self.key)
+                self.uploaded = True
+                known_blobs.add(self.key)
+            await self.storage.delete_object(self._staging_key)
+            return self
+        except BaseException:
+            await self.abort()
+            raise
+
+    # 진행 중인 멀티파트 업로드 취소
+    # 저장된 blob 은 다른 프로젝트와 공유될 수 있으므로 지우지 않음
+    async def abort(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._upload_id is not None:
+            await self.storage.abort_multipart_upload(self._staging_key, self._upload_id)
+            self._upload_id = None
+
+# 작은 파일을 메모리로 받음 (저장 전에 내용을 확인해야 하는 values 등)
+class MemoryFile:
+    def __init__(self, filename, max_size):
+        self.filename = filename
+        self.max_size = max_size
+        self.body = bytearray()
+
+    async def write(self, data):
+        self.body += data
+        if len(self.body) > self.max_size:
+            raise UploadError(f"{self.filename} is larger than {self.max_size} bytes")
+
+    async def close(self):
+        self.body = bytes(self.body)
+        return self
+
+    async def abort(self):
+        pass
+
+# 메모리에 있는 파일 하나를 내용 해시 경로로 저장 (같은 내용이 있으면 업로드 생략)
+async def store_blob(storage, filename, body):
+    writer = S3StreamWriter(storage, filename)
+    await writer.write(body)
+    return await writer.close()
+
+# 파서 콜백을 (종류, 값) 이벤트 목록으로 모음
+class _Events:
+    def __init__(self):
+        self.items = []
+        self._headers = []
+        self._field = b""
+        self._value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = []
+
+    def on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers.append((self._field.lower(), self._value))
+        self._field = b""
+        self._value = b""
+
+    def on_headers_finished(self):
+        self.items.append(("begin", dict(self._headers)))
+
+    def on_part_data(self, data, start, end):
+        self.items.append(("data", data[start:end]))
+
+    def on_part_end(self):
+        self.items.append(("end", None))
+
+# 요청 본문(multipart/form-data)을 디스크에 쓰지 않고 바로 저장소(S3)로 보냄
+# 파일마다 업로드는 병렬로 진행
+# 반환: (일반 필드 dict, {필드명: S3StreamWriter})
+async def stream_form_to_storage(request, storage, file_fields):
+    return await _stream_form(request, file_fields, lambda filename: S3StreamWriter(storage, filename))
+
+# 요청 본문을 max_size 바이트까지만 읽음 (넘으면 나머지를 받기 전에 중단)
+async def read_body(request, max_size):
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_size:
+        raise BodyTooLarge(f"Body is larger than {max_size} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_size:
+            raise BodyTooLarge(f"Body is larger than {max_size} bytes")
+    return bytes(body)
+
+# 파일을 저장하지 않고 max_size 바이트까지 메모리로 읽음
+# 반환: (일반 필드 dict, {필드명: MemoryFile})
+async def read_form(request, file_fields, max_size):
+    return await _stream_form(request, file_fields, lambda filename: MemoryFile(filename, max_size))
+
+async def _stream_form(request, file_fields, open_file):
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadError("Expected multipart/form-data")
+
+    events = _Events()
+    parser = MultipartParser(params[b"boundary"], events.callbacks())
+
+    fields = {}
+    files = {}
+    closing = []
+    name = None
+    writer = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            items, events.items = events.items, []
+            for kind, value in items:
+                if kind == "begin":
+                    _, options = parse_options_header(value.get(b"content-disposition", b""))
+                    name = options.get(b"name", b"").decode()
+                    filename = options.get(b"filename")
+                    if name in file_fields and filename is not None:
+                        filename = filename.decode()
+                        writer = open_file(filename)
+                        files[name] = writer
+                    else:
+                        writer = None
+                        fields[name] = b""
+                elif kind == "data":
+                    if writer is not None:
+                        await writer.write(value)
+                    else:
+                        fields[name] += value
+                        if len(fields[name]) > max_field_size:
+                            raise UploadError(f"Field {name} is too large")
+                elif kind == "end" and writer is not None:
+                    # 마지막 파트 전송/완료는 다음 파일을 읽는 동안 병렬로 진행
+                    closing.append(asyncio.create_task(writer.close()))
+                    writer = None
+        parser.finalize()
+        await asyncio.gather(*closing)
+    except BaseException:
+        await asyncio.gather(*closing, return_exceptions=True)
+        for open_writer in files.values():
+            await open_writer.abort()
+        raise
+
+    return {key: value.decode() for key, value in fields.items()}, files
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import yaml
+
+# values.yaml 을 해석한 값 기준 비교
+# 키 순서 / 들여쓰기 / 주석 / 따옴표만 다른 파일은 같은 값으로 보고 젠킨스 빌드를 생략
+
+class InvalidValues(ValueError):
+    pass
+
+def parse(body):
+    try:
+        values = yaml.safe_load(body)
+    except yaml.YAMLError as e:
+        raise InvalidValues(f"values is not valid YAML: {e}")
+    if values is None:
+        return {}
+    if not isinstance(values, dict):
+        raise InvalidValues("values must be a YAML mapping")
+    return values
+
+# YAML 은 숫자 / bool 키도 허용하므로 JSON 처럼 문자열 키로 맞춤
+def _normalize(value):
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    return value
+
+# 키를 정렬한 JSON 의 sha256 (날짜 등 JSON 이 아닌 값은 문자열로)
+def canonical_digest(values):
+    raw = json.dumps(_normalize(values), sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return f"sha256:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+def dump(values):
+    return yaml.safe_dump(values, sort_keys=False, allow_unicode=True).encode()
+
+# JSON Merge Patch (RFC 7386): 객체는 재귀적으로 합치고, null 은 키 삭제, 그 외 값은 통째로 교체
+def merge_patch(target, patch):
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result